@@ -0,0 +1,19 @@
+"""WSGI entry point serving main.app against the offline stand-ins.
+
+run_load.py starts gunicorn with `bench_app:app` and passes the stand-in URLs in
+BENCH_YOUTUBE_URL and BENCH_PROXY_SOURCES (comma-separated).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Configure upstreams before anything can reach the real proxy sources
+os.environ['PROXY_REFRESH_IN_BACKGROUND'] = '0'
+
+import main
+from fake_servers import configure_app
+
+configure_app(main, os.environ['BENCH_YOUTUBE_URL'], os.environ['BENCH_PROXY_SOURCES'].split(','))
+main.PROXY_REFRESHER.refresh()
+
+app = main.app
@@ -0,0 +1,280 @@
+"""Local stand-ins for YouTube, the public proxy-list sources and HTTP proxies.
+
+Everything here binds to 127.0.0.1 so benchmarks never leave the machine:
+
+- FakeYouTube serves the watch page, the innertube player endpoint and timedtext
+  XML that youtube_transcript_api expects, with configurable latency, block rate
+  and transcript size. Video IDs starting with "disabled-" have no captions and
+  ones starting with "unavailable-" are reported as unavailable.
+- FakeProxy is a plain forwarding HTTP proxy with its own latency and failure rate.
+- FakeProxyLists serves host:port lists in place of the three proxy-list sources.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PROXY_HEADER = 'X-Bench-Proxy'  # Added by FakeProxy so FakeYouTube can tell proxied traffic apart
+WORDS = ("the", "a", "transcript", "video", "lecture", "model", "data", "and", "we", "see",
+         "that", "this", "is", "how", "proxy", "cache", "request", "latency", "chunk", "segment")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class _BaseServer:
+    """Runs a handler class on an ephemeral localhost port in a daemon thread"""
+
+    handler = None
+
+    def __init__(self):
+        handler = type(self.handler.__name__, (self.handler,), {"owner": self})
+        self._server = _Server(('127.0.0.1', 0), handler)
+        self.port = self._server.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real services
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='text/plain'):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def build_timedtext(video_id, segments, language='en'):
+    """Deterministic timedtext XML with `segments` entries about 3 seconds apart"""
+    rng = random.Random(f"{video_id}:{language}")
+    parts = ['<?xml version="1.0" encoding="utf-8" ?><transcript>']
+    start = 0.0
+    for _ in range(segments):
+        duration = round(rng.uniform(1.5, 4.5), 2)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+        parts.append(f'<text start="{start:.2f}" dur="{duration}">{text}</text>')
+        start = round(start + rng.uniform(2.0, 4.0), 2)
+    parts.append('</transcript>')
+    return ''.join(parts)
+
+class _YouTubeHandler(_QuietHandler):
+    def _delay_and_maybe_block(self):
+        owner = self.owner
+        owner.count('requests')
+        if owner.latency:
+            time.sleep(owner.latency * random.uniform(0.8, 1.2))
+        block_rate = owner.proxy_block_rate if self.headers.get(PROXY_HEADER) else owner.block_rate
+        if block_rate and random.random() < block_rate:
+            owner.count('blocked')
+            self._send(429, 'Too Many Requests')
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/robots.txt':
+            self._send(200, 'User-agent: *\nDisallow:\n')
+        elif url.path == '/watch':
+            if self._delay_and_maybe_block():
+                return
+            self._send(200, '<html><script>ytcfg.set({"INNERTUBE_API_KEY": "benchkey"});</script></html>', 'text/html')
+        elif url.path == '/api/timedtext':
+            if self._delay_and_maybe_block():
+                return
+            video_id = query.get('v', [''])[0]
+            language = query.get('tlang', query.get('lang', ['en']))[0]  # Translated tracks add tlang=
+            self._send(200, self.owner.timedtext(video_id, language), 'text/xml')
+        else:
+            self._send(404, 'Not Found')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        if url.path != '/youtubei/v1/player':
+            self._send(404, 'Not Found')
+            return
+        if self._delay_and_maybe_block():
+            return
+        video_id = json.loads(body or b'{}').get('videoId', '')
+        self._send(200, json.dumps(self.owner.player_response(video_id)), 'application/json')
+
+class FakeYouTube(_BaseServer):
+    """Serves the three requests youtube_transcript_api makes per fetch"""
+
+    handler = _YouTubeHandler
+
+    def __init__(self, latency=0.0, block_rate=0.0, proxy_block_rate=0.0, segments=1200):
+        super().__init__()
+        self.latency = latency
+        self.block_rate = block_rate
+        self.proxy_block_rate = proxy_block_rate
+        self.segments = segments
+        self.counters = {'requests': 0, 'blocked': 0}
+        self._timedtext = {}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def timedtext(self, video_id, language):
+        key = (video_id, language)
+        body = self._timedtext.get(key)
+        if body is None:
+            body = self._timedtext[key] = build_timedtext(video_id, self.segments, language)
+        return body
+
+    def player_response(self, video_id):
+        if video_id.startswith('unavailable-'):
+            return {"playabilityStatus": {"status": "ERROR", "reason": "This video is unavailable"}}
+        response = {"playabilityStatus": {"status": "OK"}}
+        if video_id.startswith('disabled-'):
+            return response
+        response["captions"] = {
+            "playerCaptionsTracklistRenderer": {
+                "captionTracks": [
+                    {
+                        "baseUrl": f"{self.base_url}/api/timedtext?v={video_id}&lang=en",
+                        "name": {"runs": [{"text": "English"}]},
+                        "languageCode": "en",
+                        "isTranslatable": True
+                    },
+                    {
+                        "baseUrl": f"{self.base_url}/api/timedtext?v={video_id}&lang=de&kind=asr",
+                        "name": {"runs": [{"text": "German (auto-generated)"}]},
+                        "languageCode": "de",
+                        "kind": "asr",
+                        "isTranslatable": True
+                    }
+                ],
+                "translationLanguages": [
+                    {"languageCode": "fr", "languageName": {"runs": [{"text": "French"}]}},
+                    {"languageCode": "es", "languageName": {"runs": [{"text": "Spanish"}]}}
+                ]
+            }
+        }
+        return response
+
+_HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'te', 'trailer', 'upgrade'}
+
+class _ProxyHandler(_QuietHandler):
+    def _forward(self):
+        owner = self.owner
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        if owner.latency:
+            time.sleep(owner.latency * random.uniform(0.8, 1.2))
+        if owner.failure_rate and random.random() < owner.failure_rate:
+            self._send(502, 'Bad Gateway')
+            return
+
+        target = urlsplit(self.path)
+        headers = {key: value for key, value in self.headers.items() if key.lower() not in _HOP_BY_HOP}
+        headers[PROXY_HEADER] = '1'
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        try:
+            path = target.path + (f"?{target.query}" if target.query else '')
+            connection.request(self.command, path, body=body or None, headers=headers)
+            upstream = connection.getresponse()
+            payload = upstream.read()
+            self.send_response(upstream.status)
+            for key, value in upstream.getheaders():
+                if key.lower() not in _HOP_BY_HOP and key.lower() != 'content-length':
+                    self.send_header(key, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            connection.close()
+
+    do_GET = _forward
+    do_POST = _forward
+
+class FakeProxy(_BaseServer):
+    """Forwarding HTTP proxy for plain-http targets (absolute-URI requests)"""
+
+    handler = _ProxyHandler
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        super().__init__()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.address = f"127.0.0.1:{self.port}"
+
+class _ProxyListHandler(_QuietHandler):
+    def do_GET(self):
+        lists = self.owner.lists
+        name = urlsplit(self.path).path.strip('/')
+        if name not in lists:
+            self._send(404, 'Not Found')
+            return
+        self._send(200, '\n'.join(lists[name]) + '\n')
+
+class FakeProxyLists(_BaseServer):
+    """Serves host:port lists, one path per proxy-list source"""
+
+    handler = _ProxyListHandler
+
+    def __init__(self, proxies, sources=3):
+        super().__init__()
+        # Spread the proxies over the sources; the first one is listed everywhere, like popular proxies are
+        self.lists = {f"source{i}": [p for j, p in enumerate(proxies) if j % sources == i or j == 0] for i in range(sources)}
+
+    def source_urls(self):
+        return [f"{self.base_url}/{name}" for name in self.lists]
+
+def start_offline_upstreams(latency=0.0, block_rate=0.0, proxy_block_rate=0.0, segments=1200,
+                            proxies=5, proxy_latency=0.0, proxy_failure_rate=0.0):
+    """Start a fake YouTube, `proxies` fake proxies and the proxy-list sources pointing at them"""
+    youtube = FakeYouTube(latency, block_rate, proxy_block_rate, segments).start()
+    fake_proxies = [FakeProxy(proxy_latency, proxy_failure_rate).start() for _ in range(proxies)]
+    proxy_lists = FakeProxyLists([proxy.address for proxy in fake_proxies]).start()
+    return youtube, fake_proxies, proxy_lists
+
+def configure_app(main, youtube_url, proxy_source_urls):
+    """Point youtube_transcript_api and an imported main module at the local stand-ins"""
+    from youtube_transcript_api import _transcripts
+    _transcripts.WATCH_URL = youtube_url + "/watch?v={video_id}"
+    _transcripts.INNERTUBE_API_URL = youtube_url + "/youtubei/v1/player?key={api_key}"
+    main.PROXY_SOURCES = [(f"Bench source {i}", url, 30) for i, url in enumerate(proxy_source_urls)]
+    main.PROXY_TEST_URLS = [youtube_url + "/robots.txt"]
+    main.YOUTUBE_PROBE_URL = youtube_url + "/robots.txt"
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the offline stand-ins until interrupted")
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--block-rate', type=float, default=0.0)
+    parser.add_argument('--proxy-block-rate', type=float, default=0.0)
+    parser.add_argument('--segments', type=int, default=1200)
+    parser.add_argument('--proxies', type=int, default=5)
+    args = parser.parse_args()
+
+    youtube, fake_proxies, proxy_lists = start_offline_upstreams(
+        args.latency, args.block_rate, args.proxy_block_rate, args.segments, args.proxies
+    )
+    print(f"YouTube stand-in: {youtube.base_url}")
+    print(f"Proxies: {', '.join(proxy.address for proxy in fake_proxies)}")
+    print(f"Proxy lists: {', '.join(proxy_lists.source_urls())}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,100 @@
+"""Microbenchmarks for the CPU-bound parts of a /transcript response.
+
+Times chunking, building the compact cached form and its search index, range
+lookups, materializing the response, JSON serialization, gzip and the streamed
+encoders on synthetic 10-minute, 1-hour and 5-hour transcripts. No network.
+
+    python benchmarks/microbench.py [--repeat 7] [--json]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROXY_REFRESH_IN_BACKGROUND', '0')
+
+import main
+
+SIZES = (("10min", 600), ("1h", 3600), ("5h", 5 * 3600))
+
+def synthetic_transcript(total_seconds, seed=0):
+    """Segments roughly 3 seconds apart, shaped like FetchedTranscript.to_raw_data()"""
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    while start < total_seconds:
+        text = " ".join(rng.choice(("we", "see", "the", "model", "data", "cache", "and", "proxy")) for _ in range(rng.randint(4, 12)))
+        segments.append({"text": text, "start": round(start, 2), "duration": round(rng.uniform(1.5, 4.5), 2)})
+        start += rng.uniform(2.0, 4.0)
+    return segments
+
+def timeit(fn, repeat):
+    """Median wall time of `repeat` runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+def check_point_query(transcript):
+    """A range inside a segment must return the segment being spoken at that time"""
+    middle = len(transcript) // 2
+    point = transcript.starts[middle] + transcript.durations[middle] / 2
+    first, last, _, _ = transcript.select(point, point + 0.01)
+    assert first <= middle < last, f"range at {point}s missed segment {middle} (got [{first}, {last}))"
+
+def bench_size(segments, repeat):
+    options = dict(main.DEFAULT_CHUNK_OPTIONS)
+    fields = set(main.TRANSCRIPT_FIELDS)
+    chunk_ranges = list(main.iter_chunk_ranges(segments, **options))
+    transcript = main.CompactTranscript("benchvideo", segments, chunk_ranges)
+    check_point_query(transcript)
+    view = transcript.view()
+    result = main.project_transcript(view, fields)
+    with main.app.app_context():
+        body = main.app.json.dumps(result, separators=(',', ':')).encode()
+        timings = {
+            "chunk_ranges": timeit(lambda: list(main.iter_chunk_ranges(segments, **options)), repeat),
+            "compact_build": timeit(lambda: main.CompactTranscript("benchvideo", segments, chunk_ranges), repeat),
+            "search_index": timeit(lambda: main.TranscriptSearchIndex(transcript), repeat),
+            "range_select": timeit(lambda: transcript.select(segments[-1]["start"] / 2, segments[-1]["start"] / 2 + 60), repeat),
+            "materialize": timeit(lambda: main.project_transcript(view, fields), repeat),
+            "json_dumps": timeit(lambda: json.dumps(result), repeat),
+            "app_json_dumps": timeit(lambda: main.app.json.dumps(result, separators=(',', ':')), repeat),
+            "gzip": timeit(lambda: gzip.compress(body, main.GZIP_LEVEL), repeat),
+            "stream_json": timeit(lambda: ''.join(main.buffer_stream(main.iter_transcript_json(view, fields))), repeat),
+            "stream_ndjson": timeit(lambda: ''.join(main.buffer_stream(main.iter_transcript_ndjson(view, fields))), repeat),
+        }
+    return {
+        "segments": len(segments),
+        "chunks": len(chunk_ranges),
+        "cached_bytes": transcript.size(),
+        "body_bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, main.GZIP_LEVEL)),
+        "timings_ms": {name: round(value, 2) for name, value in timings.items()}
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = {label: bench_size(synthetic_transcript(seconds), args.repeat) for label, seconds in SIZES}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for label, row in report.items():
+        print(f"{label}: {row['segments']} segments, {row['chunks']} chunks, {row['cached_bytes'] // 1024} KiB cached, "
+              f"{row['body_bytes'] // 1024} KiB body ({row['gzip_bytes'] // 1024} KiB gzipped)")
+        for name, value in row["timings_ms"].items():
+            print(f"    {name:<16} {value:>9.2f} ms")
+
+if __name__ == '__main__':
+    main_cli()
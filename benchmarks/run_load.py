@@ -0,0 +1,229 @@
+"""Offline load test: drive the Flask app against local stand-ins for YouTube and the proxy sources.
+
+Examples:
+    python benchmarks/run_load.py --requests 2000 --concurrency 16 --videos 50
+    python benchmarks/run_load.py --server gunicorn --workers 2 --threads 8 --block-rate 1
+    python benchmarks/run_load.py --endpoint batch --batch-size 20 --json
+
+Reports throughput, p50/p95/p99 latency, status codes and server memory. The
+in-process server shares the GIL with the load generator, so use --server
+gunicorn for numbers that resemble production.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_servers import configure_app, start_offline_upstreams
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def read_rss_kb(pid):
+    """Current and peak resident memory of a process, from /proc (Linux only)"""
+    rss = peak = 0
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1])
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, peak
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def start_inprocess_server(youtube_url, proxy_sources, env):
+    os.environ.update(env)
+    os.environ['PROXY_REFRESH_IN_BACKGROUND'] = '0'
+    import main
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # One access-log line per request skews timings
+    configure_app(main, youtube_url, proxy_sources)
+    main.PROXY_REFRESHER.refresh()
+    server = make_server('127.0.0.1', 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown, [os.getpid()]
+
+def start_gunicorn_server(youtube_url, proxy_sources, env, workers, threads):
+    port = free_port()
+    process_env = {
+        **os.environ,
+        **env,
+        'BENCH_YOUTUBE_URL': youtube_url,
+        'BENCH_PROXY_SOURCES': ','.join(proxy_sources),
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--threads', str(threads), '--log-level', 'warning', 'bench_app:app'],
+        cwd=BENCH_DIR, env=process_env, stdout=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/health', timeout=1).status_code == 200:
+                break
+        except requests.RequestException:
+            time.sleep(0.2)
+    else:
+        process.kill()
+        raise RuntimeError("gunicorn did not come up within 30s")
+
+    def stop():
+        process.terminate()
+        process.wait(10)
+
+    return base_url, stop, [process.pid] + child_pids(process.pid)
+
+def run_load(base_url, args):
+    """Issue args.requests requests from args.concurrency threads; returns (elapsed, [(latency, status)])"""
+    video_ids = [f"bench{i:05d}" for i in range(args.videos)]
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def one_request(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            if args.endpoint == 'batch':
+                batch = random.sample(video_ids, min(args.batch_size, len(video_ids)))
+                response = session.post(base_url + '/transcripts', json={"video_ids": batch}, timeout=args.timeout)
+            else:
+                params = {"video_id": random.choice(video_ids)}
+                if args.fields:
+                    params["fields"] = args.fields
+                if args.format:
+                    params["format"] = args.format
+                response = session.get(base_url + '/transcript', params=params, timeout=args.timeout)
+            response.content  # Include body transfer in the latency
+            status = response.status_code
+        except requests.RequestException:
+            status = 'error'
+        elapsed = time.perf_counter() - started
+        with results_lock:
+            results.append((elapsed, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one_request, range(args.requests)))
+    return time.perf_counter() - started, results
+
+def summarize(elapsed, results, pids, youtube, base_url):
+    latencies = sorted(latency for latency, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    rss = peak = 0
+    for pid in pids:
+        pid_rss, pid_peak = read_rss_kb(pid)
+        rss += pid_rss
+        peak += pid_peak
+    try:
+        cache_stats = requests.get(base_url + '/cache-stats', timeout=5).json()
+    except (requests.RequestException, ValueError):
+        cache_stats = None
+    return {
+        "requests": len(results),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0
+        },
+        "statuses": statuses,
+        "server_memory_kb": {"rss": rss, "peak_rss": peak},
+        "upstream_requests": dict(youtube.counters),
+        "cache": cache_stats
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=('inprocess', 'gunicorn'), default='inprocess')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument('--endpoint', choices=('transcript', 'batch'), default='transcript')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--videos', type=int, default=50, help="distinct video IDs to spread requests over")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--fields', default=None)
+    parser.add_argument('--format', default=None)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--latency', type=float, default=0.05, help="fake YouTube latency per upstream request (s)")
+    parser.add_argument('--block-rate', type=float, default=0.0, help="share of direct upstream requests answered 429")
+    parser.add_argument('--proxy-block-rate', type=float, default=0.0, help="share of proxied upstream requests answered 429")
+    parser.add_argument('--segments', type=int, default=1200, help="segments per transcript (1200 is about an hour)")
+    parser.add_argument('--proxies', type=int, default=5)
+    parser.add_argument('--proxy-latency', type=float, default=0.01)
+    parser.add_argument('--proxy-failure-rate', type=float, default=0.0)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help="extra service settings, e.g. --env TRANSCRIPT_CACHE_MAX_ENTRIES=0")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    youtube, fake_proxies, proxy_lists = start_offline_upstreams(
+        args.latency, args.block_rate, args.proxy_block_rate, args.segments,
+        args.proxies, args.proxy_latency, args.proxy_failure_rate
+    )
+    # Limits meant for public traffic would only measure themselves here
+    env = {'RATE_LIMIT_PER_MINUTE': '0', 'ADMISSION_MAX_CONCURRENT': '1000', 'PROXY_VALIDATE_ON_REFRESH': '0'}
+    env.update(item.split('=', 1) for item in args.env)
+
+    if args.server == 'gunicorn':
+        base_url, stop, pids = start_gunicorn_server(youtube.base_url, proxy_lists.source_urls(), env, args.workers, args.threads)
+    else:
+        base_url, stop, pids = start_inprocess_server(youtube.base_url, proxy_lists.source_urls(), env)
+
+    try:
+        elapsed, results = run_load(base_url, args)
+        report = summarize(elapsed, results, pids, youtube, base_url)
+    finally:
+        stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    latency = report["latency_ms"]
+    print(f"{report['requests']} requests in {report['elapsed_seconds']}s -> {report['throughput_rps']} req/s")
+    print(f"latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"statuses: {report['statuses']}")
+    print(f"server memory: rss {report['server_memory_kb']['rss'] // 1024} MiB, peak {report['server_memory_kb']['peak_rss'] // 1024} MiB")
+    print(f"upstream requests: {report['upstream_requests']}")
+
+if __name__ == '__main__':
+    main_cli()
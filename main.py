@@ -1,68 +1,927 @@
-from flask import Flask, request, jsonify
-from youtube_transcript_api import YouTubeTranscriptApi
+from flask import Flask, Response, g, request, jsonify
+from youtube_transcript_api import (
+    AgeRestricted,
+    InvalidVideoId,
+    NoTranscriptFound,
+    NotTranslatable,
+    RequestBlocked,
+    Transcript,
+    TranscriptsDisabled,
+    TranslationLanguageNotAvailable,
+    VideoUnavailable,
+    VideoUnplayable,
+    YouTubeRequestFailed,
+    YouTubeTranscriptApi,
+)
 from flask_cors import CORS
+import gzip
+import hashlib
 import json
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import random
+import sqlite3
+from array import array
+import bisect
+import copy
+import heapq
+import re
+import contextvars
+import functools
+import math
+import sys
+import threading
 import time
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from itertools import accumulate
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))  # Reverse proxies in front of the app (Render has one)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+if TRUSTED_PROXY_HOPS:
+    # Only the X-Forwarded-For entries our own proxies appended are trusted; clients write the rest
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+# Metrics
+METRICS_PREFIX = 'yt_transcript_'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# Stage timings of the current request; copied into worker threads that do part of its work
+_REQUEST_TIMINGS = contextvars.ContextVar('request_timings', default=None)
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Latency histograms recorded as work happens, plus collectors that read existing counters at scrape time"""
+
+    def __init__(self):
+        self._histograms = {}  # name -> (help, {labels: Histogram})
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, help_text='', **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._histograms.setdefault(name, (help_text, {}))
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(value)
+
+    def collector(self, fn):
+        """Register fn() -> [(name, type, help, value, labels)] to be read on every scrape"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        """Everything in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (help_text, series) in sorted(self._histograms.items()):
+                full_name = METRICS_PREFIX + name
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full_name}_bucket{_format_labels(key + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {histogram.count}")
+        
+        described = set()
+        for collect in self._collectors:
+            for name, metric_type, help_text, value, labels in collect():
+                full_name = METRICS_PREFIX + name
+                if full_name not in described:
+                    described.add(full_name)
+                    lines.append(f"# HELP {full_name} {help_text}")
+                    lines.append(f"# TYPE {full_name} {metric_type}")
+                lines.append(f"{full_name}{_format_labels(tuple(sorted((labels or {}).items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+METRICS = MetricsRegistry()
+
+@contextmanager
+def timed_stage(name):
+    """Time a stage of transcript handling into the stage histogram and the per-request breakdown"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        METRICS.observe('stage_duration_seconds', elapsed, "Time spent in each stage of transcript handling", stage=name)
+        timings = _REQUEST_TIMINGS.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+def submit_with_context(executor, fn, *args):
+    """executor.submit that carries the caller's request timing context into the worker thread"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    _REQUEST_TIMINGS.set([])
+
+@app.after_request
+def record_request_timing(response):
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    METRICS.observe('http_request_duration_seconds', elapsed, "Time to produce response headers per endpoint",
+                    endpoint=endpoint, status=str(response.status_code))
+    
+    # Per-request breakdown, readable in browser dev tools or with curl -i
+    timings = _REQUEST_TIMINGS.get()
+    if timings:
+        response.headers['Server-Timing'] = ', '.join(
+            f"{name};dur={elapsed_stage * 1000:.1f}" for name, elapsed_stage in timings
+        ) + f", total;dur={elapsed * 1000:.1f}"
+    return response
 
 # Proxy management
-PROXY_LIST = []
 LAST_PROXY_UPDATE = 0
 PROXY_UPDATE_INTERVAL = 3600  # Update proxies every hour
+PROXY_EWMA_ALPHA = 0.3  # Weight of the newest observation in success/latency averages
+PROXY_DEFAULT_LATENCY = 5.0  # Seconds assumed for proxies we have not timed yet
+PROXY_FAILURE_THRESHOLD = int(os.environ.get('PROXY_FAILURE_THRESHOLD', 3))  # Consecutive failures before quarantine
+PROXY_COOLOFF = float(os.environ.get('PROXY_COOLOFF', 600))  # Seconds a quarantined proxy is skipped
 
-def get_free_proxies():
-    """Fetch free proxy list from multiple sources with better filtering"""
-    proxies = []
-    
-    # Source 1: ProxyScrape API (Elite proxies)
-    try:
-        response = requests.get(
-            "https://api.proxyscrape.com/v2/?request=get&format=textplain&protocol=http&timeout=5000&country=US,CA,GB,DE,FR&anonymity=elite",
-            timeout=15
-        )
-        if response.status_code == 200:
-            proxy_list = response.text.strip().split('\n')
-            for proxy in proxy_list[:30]:  # Increased limit
-                proxy = proxy.strip()
-                if ':' in proxy and len(proxy.split(':')) == 2:
-                    proxies.append(proxy)
-    except Exception as e:
-        print(f"ProxyScrape failed: {e}")
-    
-    # Source 2: Alternative source with different format
-    try:
-        response = requests.get(
-            "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt",
-            timeout=15
-        )
-        if response.status_code == 200:
-            proxy_list = response.text.strip().split('\n')
-            for proxy in proxy_list[:20]:
-                proxy = proxy.strip()
-                if ':' in proxy and len(proxy.split(':')) == 2:
-                    proxies.append(proxy)
-    except Exception as e:
-        print(f"GitHub proxy source failed: {e}")
+class ProxyStats:
+    """Running success/latency record for a single proxy"""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.success_ewma = 0.5  # Neutral prior until we have observations
+        self.latency_ewma = None
+        self.last_success = 0
+        self.last_failure = 0
+        self.quarantined_until = 0
+        self.quarantine_count = 0
+
+    def update_from(self, row):
+        """Take over a record kept in the shared store"""
+        for name, value in row.items():
+            setattr(self, name, value)
+
+    def score(self):
+        latency = PROXY_DEFAULT_LATENCY if self.latency_ewma is None else self.latency_ewma
+        return self.success_ewma / (1 + latency / PROXY_DEFAULT_LATENCY)
+
+    def to_dict(self, now):
+        return {
+            "proxy": self.proxy,
+            "score": round(self.score(), 4),
+            "success_rate": round(self.success_ewma, 4),
+            "latency_ms": None if self.latency_ewma is None else round(self.latency_ewma * 1000),
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "quarantined": self.quarantined_until > now,
+            "quarantined_for": max(0, round(self.quarantined_until - now)),
+            "last_success": self.last_success,
+            "last_failure": self.last_failure
+        }
+
+class ProxyPool:
+    """Proxy list that remembers how each proxy performed and picks proxies weighted by score.
+
+    A proxy that fails PROXY_FAILURE_THRESHOLD times in a row is quarantined for
+    PROXY_COOLOFF seconds. After the cool-off it gets a single trial: one more
+    failure sends it straight back into quarantine, a success closes the breaker.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._last_sync = 0
+
+    def __len__(self):
+        return len(self._stats)
+
+    def __bool__(self):
+        return bool(self._stats)
+
+    def proxies(self):
+        with self._lock:
+            return list(self._stats)
+
+    def replace(self, proxies):
+        """Swap in a new proxy list, keeping the history of proxies that are still listed"""
+        with self._lock:
+            self._stats = {proxy: self._stats.get(proxy) or ProxyStats(proxy) for proxy in proxies}
+
+    def record_success(self, proxy, latency):
+        row = SHARED_STORE.record_proxy_result(proxy, True, latency) if SHARED_STORE else None
+        if row is not None:
+            self._apply_shared(proxy, row)
+            return
+        with self._lock:
+            stats = self._stats.get(proxy)
+            if stats is None:
+                return
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.quarantined_until = 0
+            stats.last_success = time.time()
+            stats.success_ewma += PROXY_EWMA_ALPHA * (1 - stats.success_ewma)
+            if stats.latency_ewma is None:
+                stats.latency_ewma = latency
+            else:
+                stats.latency_ewma += PROXY_EWMA_ALPHA * (latency - stats.latency_ewma)
+
+    def record_failure(self, proxy):
+        row = SHARED_STORE.record_proxy_result(proxy, False) if SHARED_STORE else None
+        if row is not None:
+            self._apply_shared(proxy, row)
+            return
+        with self._lock:
+            stats = self._stats.get(proxy)
+            if stats is None:
+                return
+            now = time.time()
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_failure = now
+            stats.success_ewma -= PROXY_EWMA_ALPHA * stats.success_ewma
+            if stats.consecutive_failures >= PROXY_FAILURE_THRESHOLD:
+                stats.quarantined_until = now + PROXY_COOLOFF
+                stats.quarantine_count += 1
+
+    def _apply_shared(self, proxy, row):
+        with self._lock:
+            stats = self._stats.get(proxy)
+            if stats is not None:
+                stats.update_from(row)
+
+    def sync_shared(self, force=False):
+        """Pull the scores other workers recorded, at most every SHARED_STORE_SYNC_INTERVAL seconds"""
+        if not SHARED_STORE or (not force and time.time() - self._last_sync < SHARED_STORE_SYNC_INTERVAL):
+            return
+        self._last_sync = time.time()
+        rows = SHARED_STORE.load_proxy_stats(self.proxies())
+        with self._lock:
+            for proxy, row in rows.items():
+                stats = self._stats.get(proxy)
+                if stats is not None:
+                    stats.update_from(row)
+
+    def choose(self, exclude=()):
+        """Pick a proxy that is not quarantined or excluded, weighted by score"""
+        self.sync_shared()
+        now = time.time()
+        with self._lock:
+            candidates = [
+                stats for proxy, stats in self._stats.items()
+                if proxy not in exclude and stats.quarantined_until <= now
+            ]
+            if not candidates:
+                return None
+            weights = [max(stats.score(), 0.001) for stats in candidates]
+            return random.choices(candidates, weights=weights)[0].proxy
+
+    def best(self, count, exclude=()):
+        """Up to `count` proxies that are not quarantined or excluded, highest score first"""
+        self.sync_shared()
+        now = time.time()
+        with self._lock:
+            candidates = [
+                stats for proxy, stats in self._stats.items()
+                if proxy not in exclude and stats.quarantined_until <= now
+            ]
+        random.shuffle(candidates)  # Unscored proxies tie; don't always favour the same ones
+        candidates.sort(key=lambda stats: stats.score(), reverse=True)
+        return [stats.proxy for stats in candidates[:count]]
+
+    def recently_succeeded(self, proxy, window):
+        """Whether the proxy's last observation was a success within the past `window` seconds"""
+        with self._lock:
+            stats = self._stats.get(proxy)
+            return (
+                stats is not None
+                and stats.consecutive_failures == 0
+                and time.time() - stats.last_success <= window
+            )
+
+    def available_count(self):
+        now = time.time()
+        with self._lock:
+            return sum(1 for stats in self._stats.values() if stats.quarantined_until <= now)
+
+    def snapshot(self):
+        """Per-proxy scores, best first"""
+        now = time.time()
+        with self._lock:
+            ranked = sorted(self._stats.values(), key=lambda stats: stats.score(), reverse=True)
+            return [stats.to_dict(now) for stats in ranked]
+
+PROXY_POOL = ProxyPool()
+
+# Pooled HTTP sessions (one for direct traffic, one per proxy)
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 20))  # Seconds per upstream request
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))  # Kept-alive connections per host
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+HTTP_BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.5))  # Retry backoff factor in seconds
+HTTP_MAX_PROXY_SESSIONS = int(os.environ.get('HTTP_MAX_PROXY_SESSIONS', 50))
+
+# User agents for rotation
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'
+]
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default timeout to every request"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+def create_http_session(proxy=None):
+    """Build a keep-alive session with a bounded connection pool and retry/backoff policy"""
+    session = TimeoutSession(HTTP_TIMEOUT)
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=0 if proxy else HTTP_RETRIES,  # A dead proxy should fail fast so the next one gets a turn
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
     
-    # Source 3: Free Proxy List with country filter
+    if proxy:
+        session.proxies = {
+            "http": f"http://{proxy}",
+            "https": f"http://{proxy}"
+        }
+        session.headers.update({
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        })
+    return session
+
+class HttpSessionRegistry:
+    """Hands out one long-lived session per proxy (and one for direct traffic) so connections get reused"""
+
+    def __init__(self, max_proxy_sessions):
+        self.max_proxy_sessions = max_proxy_sessions
+        self._direct = None
+        self._proxy_sessions = OrderedDict()  # proxy -> session, least recently used first
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+
+    def get(self, proxy=None):
+        with self._lock:
+            if proxy is None:
+                if self._direct is None:
+                    self._direct = create_http_session()
+                    self.created += 1
+                return self._direct
+            
+            session = self._proxy_sessions.get(proxy)
+            if session is None:
+                session = create_http_session(proxy)
+                self._proxy_sessions[proxy] = session
+                self.created += 1
+                while len(self._proxy_sessions) > self.max_proxy_sessions:
+                    _, oldest = self._proxy_sessions.popitem(last=False)
+                    self._close(oldest)
+            else:
+                self._proxy_sessions.move_to_end(proxy)
+            return session
+
+    def prune(self, keep):
+        """Close sessions for proxies that are no longer in the pool"""
+        keep = set(keep)
+        with self._lock:
+            for proxy in [proxy for proxy in self._proxy_sessions if proxy not in keep]:
+                self._close(self._proxy_sessions.pop(proxy))
+
+    def _close(self, session):
+        session.close()
+        self.closed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "proxy_sessions": len(self._proxy_sessions),
+                "created": self.created,
+                "closed": self.closed,
+                "pool_size": HTTP_POOL_SIZE,
+                "retries": HTTP_RETRIES
+            }
+
+HTTP_SESSIONS = HttpSessionRegistry(HTTP_MAX_PROXY_SESSIONS)
+
+# Processed transcript cache
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_ENTRIES', 1024))  # The byte budget is usually the binding limit
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+TRANSCRIPT_CACHE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 6 * 3600))  # Seconds
+
+class TranscriptCache:
+    """Thread-safe LRU cache with a per-entry TTL, bounded by entry count and total size"""
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self._listeners = []  # (on_set, on_remove) pairs
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Return a live value without touching LRU order or hit counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            return entry[0]
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def add_listener(self, on_set, on_remove):
+        """Call on_set(key, value) and on_remove(key, value) as entries come and go.
+
+        Listeners run under the cache lock, so they must be quick and must not
+        call back into the cache.
+        """
+        with self._lock:
+            self._listeners.append((on_set, on_remove))
+
+    def set(self, key, value, size, ttl=None):
+        if size > self.max_bytes or self.max_entries <= 0:
+            return  # Never worth evicting everything else for one oversized entry
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            for on_set, _ in self._listeners:
+                on_set(key, value)
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def grow(self, key, delta):
+        """Account for data added to an entry after it was stored"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            value, size, expires_at = entry
+            self._entries[key] = (value, size + delta, expires_at)
+            self.current_bytes += delta
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        value, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+        for _, on_remove in self._listeners:
+            on_remove(key, value)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+TRANSCRIPT_CACHE = TranscriptCache(
+    TRANSCRIPT_CACHE_MAX_ENTRIES,
+    TRANSCRIPT_CACHE_MAX_BYTES,
+    TRANSCRIPT_CACHE_TTL
+)
+
+# Fetched transcripts per video and language, before any non-default chunking; every chunking is derived from these
+SOURCE_CACHE_MAX_ENTRIES = int(os.environ.get('SOURCE_CACHE_MAX_ENTRIES', 512))
+SOURCE_CACHE_MAX_BYTES = int(os.environ.get('SOURCE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+TRANSCRIPT_SOURCES = TranscriptCache(
+    SOURCE_CACHE_MAX_ENTRIES,
+    SOURCE_CACHE_MAX_BYTES,
+    TRANSCRIPT_CACHE_TTL
+)
+
+# Negative cache of permanent failures (transcripts disabled, video unavailable, ...)
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.environ.get('NEGATIVE_CACHE_MAX_ENTRIES', 4096))
+NEGATIVE_CACHE_TTL = int(os.environ.get('NEGATIVE_CACHE_TTL', 600))  # Seconds before a failed video is fetched again
+
+FAILURE_CACHE = TranscriptCache(
+    NEGATIVE_CACHE_MAX_ENTRIES,
+    NEGATIVE_CACHE_MAX_ENTRIES * 1024,  # Error bodies are a few hundred bytes
+    NEGATIVE_CACHE_TTL
+)
+
+# Shared state across worker processes
+SHARED_STORE_PATH = os.environ.get('SHARED_STORE_PATH', '')  # SQLite file shared by the workers on this node; empty disables
+SHARED_STORE_SYNC_INTERVAL = float(os.environ.get('SHARED_STORE_SYNC_INTERVAL', 10))  # Seconds between pulls of proxy scores
+SHARED_STORE_PURGE_EVERY = 50  # Transcript writes between purges of expired rows
+PROXY_REFRESH_LEASE = 60  # Seconds one worker may hold the proxy refresh before others take over
+
+class SharedStore:
+    """SQLite database in WAL mode through which the worker processes on one node share
+    processed transcripts, the proxy list and proxy scores.
+
+    Every operation is best effort: a failing store is logged and counted, and the
+    worker carries on with its own in-memory state.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.transcript_hits = 0
+        self.transcript_misses = 0
+        self.transcript_writes = 0
+        self.errors = 0
+        self.last_error = None
+        self._execute_script("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                key TEXT PRIMARY KEY, video_id TEXT NOT NULL, payload BLOB NOT NULL, expires_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS transcripts_expires_at ON transcripts (expires_at);
+            CREATE TABLE IF NOT EXISTS proxy_list (
+                id INTEGER PRIMARY KEY CHECK (id = 1), proxies TEXT NOT NULL, updated_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS proxy_stats (
+                proxy TEXT PRIMARY KEY, successes INTEGER NOT NULL, failures INTEGER NOT NULL,
+                consecutive_failures INTEGER NOT NULL, success_ewma REAL NOT NULL, latency_ewma REAL,
+                last_success REAL NOT NULL, last_failure REAL NOT NULL, quarantined_until REAL NOT NULL,
+                quarantine_count INTEGER NOT NULL, updated_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder INTEGER NOT NULL, expires_at REAL NOT NULL);
+        """)
+
+    def _connection(self):
+        """One connection per thread, reopened after a fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _failed(self, action, error):
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{action}: {error}"
+        print(f"Shared store {action} failed: {error}")
+
+    def _execute_script(self, script):
+        try:
+            self._connection().executescript(script)
+        except sqlite3.Error as e:
+            self._failed("setup", e)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    # Processed transcripts
+    def load_transcript(self, cache_key):
+        """Return (CompactTranscript, expires_at) stored by any worker, or None"""
+        try:
+            row = self._connection().execute(
+                "SELECT payload, expires_at FROM transcripts WHERE key = ? AND expires_at > ?",
+                (json.dumps(cache_key), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("transcript read", e)
+            return None
+        if row is None:
+            self._count("transcript_misses")
+            return None
+        try:
+            transcript = CompactTranscript.from_bytes(row[0])
+        except Exception as e:
+            # Corrupt, or written by a different version during a rolling deploy: drop it and fetch again
+            self._failed("transcript decode", e)
+            self._count("transcript_misses")
+            try:
+                self._connection().execute("DELETE FROM transcripts WHERE key = ?", (json.dumps(cache_key),))
+            except sqlite3.Error as e:
+                self._failed("transcript delete", e)
+            return None
+        self._count("transcript_hits")
+        return transcript, row[1]
+
+    def save_transcript(self, cache_key, transcript, ttl):
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO transcripts (key, video_id, payload, expires_at) VALUES (?, ?, ?, ?)",
+                (json.dumps(cache_key), transcript.video_id, transcript.to_bytes(), time.time() + ttl)
+            )
+            self._count("transcript_writes")
+            if self.transcript_writes % SHARED_STORE_PURGE_EVERY == 0:
+                connection.execute("DELETE FROM transcripts WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            self._failed("transcript write", e)
+
+    # Proxy list
+    def load_proxy_list(self):
+        """Return (proxies, updated_at) of the last list any worker stored, or None"""
+        try:
+            row = self._connection().execute("SELECT proxies, updated_at FROM proxy_list WHERE id = 1").fetchone()
+        except sqlite3.Error as e:
+            self._failed("proxy list read", e)
+            return None
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save_proxy_list(self, proxies, updated_at):
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO proxy_list (id, proxies, updated_at) VALUES (1, ?, ?)",
+                (json.dumps(proxies), updated_at)
+            )
+        except sqlite3.Error as e:
+            self._failed("proxy list write", e)
+
+    def try_lease(self, name, seconds):
+        """Claim a named job for this process unless another live process holds it"""
+        now = time.time()
+        try:
+            cursor = self._connection().execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ? OR leases.holder = excluded.holder",
+                (name, os.getpid(), now + seconds, now)
+            )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            self._failed("lease", e)
+            return True  # Without a working store every worker is on its own anyway
+
+    def release_lease(self, name):
+        try:
+            self._connection().execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, os.getpid()))
+        except sqlite3.Error as e:
+            self._failed("lease release", e)
+
+    # Proxy scores; the same bookkeeping as ProxyPool, applied atomically to the shared row
+    _PROXY_STATS_COLUMNS = ("successes", "failures", "consecutive_failures", "success_ewma", "latency_ewma",
+                            "last_success", "last_failure", "quarantined_until", "quarantine_count")
+
+    def record_proxy_result(self, proxy, success, latency=None):
+        """Fold one observation into the shared score of `proxy` and return the updated row as a dict"""
+        now = time.time()
+        params = {"proxy": proxy, "now": now, "alpha": PROXY_EWMA_ALPHA, "latency": latency,
+                  "threshold": PROXY_FAILURE_THRESHOLD, "cooloff": PROXY_COOLOFF}
+        if success:
+            sql = """
+                INSERT INTO proxy_stats VALUES (:proxy, 1, 0, 0, 0.5 + :alpha * 0.5, :latency, :now, 0, 0, 0, :now)
+                ON CONFLICT(proxy) DO UPDATE SET
+                    successes = successes + 1, consecutive_failures = 0, quarantined_until = 0, last_success = :now,
+                    success_ewma = success_ewma + :alpha * (1 - success_ewma),
+                    latency_ewma = CASE WHEN latency_ewma IS NULL THEN :latency
+                                        ELSE latency_ewma + :alpha * (:latency - latency_ewma) END,
+                    updated_at = :now"""
+        else:
+            sql = """
+                INSERT INTO proxy_stats VALUES (:proxy, 0, 1, 1, 0.5 - :alpha * 0.5, NULL, 0, :now,
+                    CASE WHEN 1 >= :threshold THEN :now + :cooloff ELSE 0 END, 1 >= :threshold, :now)
+                ON CONFLICT(proxy) DO UPDATE SET
+                    failures = failures + 1, consecutive_failures = consecutive_failures + 1, last_failure = :now,
+                    success_ewma = success_ewma - :alpha * success_ewma,
+                    quarantined_until = CASE WHEN consecutive_failures + 1 >= :threshold THEN :now + :cooloff
+                                             ELSE quarantined_until END,
+                    quarantine_count = quarantine_count + (consecutive_failures + 1 >= :threshold),
+                    updated_at = :now"""
+        try:
+            connection = self._connection()
+            connection.execute(sql, params)
+            row = connection.execute(
+                f"SELECT {', '.join(self._PROXY_STATS_COLUMNS)} FROM proxy_stats WHERE proxy = ?", (proxy,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("proxy score write", e)
+            return None
+        return dict(zip(self._PROXY_STATS_COLUMNS, row)) if row else None
+
+    def load_proxy_stats(self, proxies):
+        """Shared scores for the given proxies, as {proxy: row dict}"""
+        if not proxies:
+            return {}
+        try:
+            rows = self._connection().execute(
+                f"SELECT proxy, {', '.join(self._PROXY_STATS_COLUMNS)} FROM proxy_stats "
+                f"WHERE proxy IN ({', '.join('?' * len(proxies))})", list(proxies)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._failed("proxy score read", e)
+            return {}
+        return {row[0]: dict(zip(self._PROXY_STATS_COLUMNS, row[1:])) for row in rows}
+
+    def stats(self):
+        try:
+            transcripts = self._connection().execute("SELECT COUNT(*) FROM transcripts WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        except sqlite3.Error:
+            transcripts = None
+        with self._lock:
+            lookups = self.transcript_hits + self.transcript_misses
+            return {
+                "path": self.path,
+                "transcripts": transcripts,
+                "transcript_hits": self.transcript_hits,
+                "transcript_misses": self.transcript_misses,
+                "transcript_hit_rate": round(self.transcript_hits / lookups, 4) if lookups else 0,
+                "transcript_writes": self.transcript_writes,
+                "errors": self.errors,
+                "last_error": self.last_error
+            }
+
+SHARED_STORE = SharedStore(SHARED_STORE_PATH) if SHARED_STORE_PATH else None
+
+# Single-flight coalescing of concurrent fetches
+FETCH_COALESCE_TIMEOUT = float(os.environ.get('FETCH_COALESCE_TIMEOUT', 120))  # Seconds a waiter waits for the leader
+
+class CoalescedFetchTimeout(Exception):
+    """Raised to a waiting caller when the shared in-flight fetch takes too long"""
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Let concurrent callers for the same key share one in-flight call instead of duplicating it"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        
+        if not is_leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise CoalescedFetchTimeout(f"Timed out after {timeout}s waiting for in-flight fetch of {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced_requests": self.coalesced,
+                "waiter_timeouts": self.timeouts
+            }
+
+TRANSCRIPT_FLIGHTS = SingleFlight()
+
+# Batch fetching
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 200))  # Video IDs accepted per batch request
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))  # Parallel fetches per batch request
+
+def transcript_cache_key(video_id, options=None):
+    """Build a cache key from the video ID and every option that changes the output"""
+    return (video_id,) + tuple(sorted((options or {}).items()))
+
+PROXY_SOURCES = [
+    # (name, url, max proxies taken from this source)
+    ("ProxyScrape", "https://api.proxyscrape.com/v2/?request=get&format=textplain&protocol=http&timeout=5000&country=US,CA,GB,DE,FR&anonymity=elite", 30),  # Elite proxies
+    ("GitHub proxy source", "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt", 20),
+    ("Proxy-list.download", "https://www.proxy-list.download/api/v1/get?type=http&anon=elite&country=US", 15),
+]
+PROXY_SOURCE_TIMEOUT = 15
+PROXY_REFRESH_IN_BACKGROUND = os.environ.get('PROXY_REFRESH_IN_BACKGROUND', '1') == '1'
+PROXY_REFRESH_RETRY_INTERVAL = 60  # Seconds before retrying a refresh that produced no proxies
+PROXY_VALIDATE_ON_REFRESH = os.environ.get('PROXY_VALIDATE_ON_REFRESH', '1') == '1'
+PROXY_VALIDATION_WORKERS = int(os.environ.get('PROXY_VALIDATION_WORKERS', 20))
+
+def fetch_proxy_source(name, url, limit):
+    """Fetch up to `limit` host:port entries from one proxy list source"""
+    proxies = []
     try:
-        response = requests.get(
-            "https://www.proxy-list.download/api/v1/get?type=http&anon=elite&country=US",
-            timeout=15
-        )
+        response = requests.get(url, timeout=PROXY_SOURCE_TIMEOUT)
         if response.status_code == 200:
             proxy_list = response.text.strip().split('\n')
-            for proxy in proxy_list[:15]:
+            for proxy in proxy_list[:limit]:
                 proxy = proxy.strip()
                 if ':' in proxy and len(proxy.split(':')) == 2:
                     proxies.append(proxy)
     except Exception as e:
-        print(f"Proxy-list.download failed: {e}")
+        print(f"{name} failed: {e}")
+    return proxies
+
+def get_free_proxies():
+    """Fetch free proxy list from all sources concurrently with better filtering"""
+    proxies = []
+    with ThreadPoolExecutor(max_workers=len(PROXY_SOURCES), thread_name_prefix="proxy-source") as executor:
+        # map() keeps source order, so earlier sources still win on duplicates
+        for source_proxies in executor.map(lambda source: fetch_proxy_source(*source), PROXY_SOURCES):
+            proxies.extend(source_proxies)
     
     # Remove duplicates and validate format
     unique_proxies = []
@@ -83,43 +942,182 @@ def get_free_proxies():
     print(f"Collected {len(unique_proxies)} unique valid proxies")
     return unique_proxies
 
+def validate_proxies(proxies):
+    """Test candidate proxies in parallel and return the ones that respond, in their original order"""
+    if not proxies:
+        return []
+    with ThreadPoolExecutor(max_workers=min(PROXY_VALIDATION_WORKERS, len(proxies)), thread_name_prefix="proxy-validate") as executor:
+        results = list(executor.map(test_proxy, proxies))
+    return [proxy for proxy, working in zip(proxies, results) if working]
+
+class ProxyRefresher:
+    """Background thread that keeps PROXY_POOL fresh so request handlers never wait on proxy sources"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self.refreshing = False
+        self.refresh_count = 0
+        self.last_started = 0
+        self.last_duration = None
+        self.last_candidates = 0
+        self.last_validated = 0
+        self.last_error = None
+        self.shared_adoptions = 0
+
+    def ensure_started(self):
+        """Start the refresher thread if it is not running (e.g. in a freshly forked worker)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="proxy-refresher", daemon=True)
+            self._thread.start()
+
+    def request_refresh(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            self.refresh()
+            # Wake when the list (possibly adopted from another worker) goes stale
+            wait_for = LAST_PROXY_UPDATE + self.interval - time.time() if PROXY_POOL else 0
+            self._wake.wait(max(wait_for, PROXY_REFRESH_RETRY_INTERVAL))
+
+    def adopt_shared_list(self):
+        """Use a fresh proxy list another worker stored instead of fetching one; returns whether it did"""
+        global LAST_PROXY_UPDATE
+        
+        shared = SHARED_STORE.load_proxy_list()
+        if not shared or not shared[0] or time.time() - shared[1] > self.interval:
+            return False
+        proxies, updated_at = shared
+        if updated_at > LAST_PROXY_UPDATE:
+            PROXY_POOL.replace(proxies)
+            PROXY_POOL.sync_shared(force=True)
+            HTTP_SESSIONS.prune(PROXY_POOL.proxies())
+            LAST_PROXY_UPDATE = updated_at
+            self.shared_adoptions += 1
+            print(f"Adopted shared proxy list with {len(proxies)} proxies")
+        return True
+
+    def refresh(self):
+        """Fetch, validate and atomically swap in a new proxy list"""
+        if SHARED_STORE:
+            if self.adopt_shared_list():
+                return
+            # Another worker is already fetching: wait for its list rather than fetching it again
+            if not SHARED_STORE.try_lease('proxy_refresh', PROXY_REFRESH_LEASE):
+                wait_until = time.time() + PROXY_REFRESH_LEASE
+                while time.time() < wait_until:
+                    time.sleep(1)
+                    if self.adopt_shared_list():
+                        return
+            try:
+                self._refresh()
+            finally:
+                SHARED_STORE.release_lease('proxy_refresh')
+        else:
+            self._refresh()
+
+    def _refresh(self):
+        global LAST_PROXY_UPDATE
+        
+        self.refreshing = True
+        self.last_started = time.time()
+        print("Updating proxy list...")
+        try:
+            candidates = get_free_proxies()
+            validated = validate_proxies(candidates) if PROXY_VALIDATE_ON_REFRESH else candidates
+            self.last_candidates = len(candidates)
+            self.last_validated = len(validated)
+            
+            if validated:
+                PROXY_POOL.replace(validated)
+            elif candidates and not PROXY_POOL:
+                # Nothing passed validation, but untested proxies beat having none at all
+                PROXY_POOL.replace(candidates)
+            HTTP_SESSIONS.prune(PROXY_POOL.proxies())
+            
+            if PROXY_POOL:
+                LAST_PROXY_UPDATE = time.time()
+                if SHARED_STORE:
+                    SHARED_STORE.save_proxy_list(PROXY_POOL.proxies(), LAST_PROXY_UPDATE)
+                    PROXY_POOL.sync_shared(force=True)
+                # Keep /proxy-status data current without making it probe on demand
+                PROXY_PROBER.probe(proxy_probe_sample())
+            self.last_error = None
+            print(f"Updated proxy list with {len(PROXY_POOL)} proxies ({len(validated)}/{len(candidates)} validated)")
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Proxy refresh failed: {e}")
+        finally:
+            self.last_duration = time.time() - self.last_started
+            self.refresh_count += 1
+            self.refreshing = False
+
+    def stats(self):
+        now = time.time()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "refreshing": self.refreshing,
+            "refresh_count": self.refresh_count,
+            "last_refresh_started": self.last_started,
+            "last_refresh_duration_seconds": None if self.last_duration is None else round(self.last_duration, 3),
+            "last_candidates": self.last_candidates,
+            "last_validated": self.last_validated,
+            "last_error": self.last_error,
+            "shared_adoptions": self.shared_adoptions,
+            "list_age_seconds": round(now - LAST_PROXY_UPDATE) if LAST_PROXY_UPDATE else None
+        }
+
+PROXY_REFRESHER = ProxyRefresher(PROXY_UPDATE_INTERVAL)
+
 def update_proxy_list():
-    """Update the global proxy list if needed"""
-    global PROXY_LIST, LAST_PROXY_UPDATE
+    """Keep the proxy pool fresh.
+
+    With the background refresher enabled this never blocks: it makes sure the
+    refresher thread is running and nudges it if the list is stale, and callers
+    keep using whatever snapshot PROXY_POOL currently holds.
+    """
+    now = time.time()
+    stale = now - LAST_PROXY_UPDATE > PROXY_UPDATE_INTERVAL or not PROXY_POOL
+    if not PROXY_REFRESH_IN_BACKGROUND:
+        if stale:
+            PROXY_REFRESHER.refresh()
+        return
     
-    current_time = time.time()
-    if current_time - LAST_PROXY_UPDATE > PROXY_UPDATE_INTERVAL or not PROXY_LIST:
-        print("Updating proxy list...")
-        PROXY_LIST = get_free_proxies()
-        LAST_PROXY_UPDATE = current_time
-        print(f"Updated proxy list with {len(PROXY_LIST)} proxies")
+    PROXY_REFRESHER.ensure_started()
+    if stale and not PROXY_REFRESHER.refreshing and now - PROXY_REFRESHER.last_started > PROXY_REFRESH_RETRY_INTERVAL:
+        PROXY_REFRESHER.request_refresh()
 
-def get_random_proxy():
-    """Get a random proxy from the list"""
+def get_random_proxy(exclude=()):
+    """Get a proxy from the pool, weighted by past success rate and latency"""
     update_proxy_list()
-    if PROXY_LIST:
-        return random.choice(PROXY_LIST)
-    return None
+    return PROXY_POOL.choose(exclude)
+
+PROXY_TEST_URLS = [
+    "http://httpbin.org/ip",
+    "http://icanhazip.com",
+    "https://api.ipify.org?format=json"
+]
+YOUTUBE_PROBE_URL = "https://www.youtube.com/robots.txt"
 
-def test_proxy(proxy):
+def test_proxy(proxy, timeout=8):
     """Test if a proxy is working with multiple test endpoints"""
-    test_urls = [
-        "http://httpbin.org/ip",
-        "http://icanhazip.com",
-        "https://api.ipify.org?format=json"
-    ]
-    
     proxy_dict = {
         "http": f"http://{proxy}",
         "https": f"http://{proxy}"
     }
     
-    for test_url in test_urls:
+    for test_url in PROXY_TEST_URLS:
         try:
             response = requests.get(
                 test_url, 
                 proxies=proxy_dict, 
-                timeout=8,
+                timeout=timeout,
                 headers={
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                 }
@@ -130,36 +1128,120 @@ def test_proxy(proxy):
             continue
     return False
 
-def test_proxy_with_youtube(proxy):
-    """Test proxy specifically with YouTube-like request"""
+def test_proxy_with_youtube(proxy, timeout=10):
+    """Test proxy specifically with YouTube-like request, recording the outcome in the pool"""
+    started = time.time()
     try:
-        proxy_dict = {
-            "http": f"http://{proxy}",
-            "https": f"http://{proxy}"
-        }
-        
-        # Test with a simple YouTube page request (not transcript API)
-        response = requests.get(
-            "https://www.youtube.com/robots.txt",
-            proxies=proxy_dict,
-            timeout=10,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-            }
+        # Test with a simple YouTube page request (not transcript API). Going through the
+        # proxy's pooled session also warms the connection a following fetch will reuse.
+        response = HTTP_SESSIONS.get(proxy).get(
+            YOUTUBE_PROBE_URL,
+            timeout=timeout
         )
-        return response.status_code == 200
+        if response.status_code == 200:
+            PROXY_POOL.record_success(proxy, time.time() - started)
+            return True
     except:
-        return False
+        pass
+    PROXY_POOL.record_failure(proxy)
+    return False
+
+# Proxy probing for /proxy-status
+PROXY_PROBE_SAMPLE = int(os.environ.get('PROXY_PROBE_SAMPLE', 10))  # Proxies probed per run
+PROXY_PROBE_TIMEOUT = float(os.environ.get('PROXY_PROBE_TIMEOUT', 8))  # Per request of the generic test
+PROXY_PROBE_YOUTUBE_TIMEOUT = float(os.environ.get('PROXY_PROBE_YOUTUBE_TIMEOUT', 10))
+PROXY_PROBE_DEADLINE = float(os.environ.get('PROXY_PROBE_DEADLINE', 20))  # Overall budget for one probe run
+PROXY_PROBE_WORKERS = int(os.environ.get('PROXY_PROBE_WORKERS', 10))
+
+class ProxyProber:
+    """Probe a sample of proxies concurrently under an overall deadline and keep the latest results"""
+
+    def __init__(self):
+        self._results = {}  # proxy -> latest probe result
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()  # One probe run at a time
+        self.last_probe_started = 0
+        self.last_probe_duration = None
+        self.last_probe_timed_out = 0
+
+    @property
+    def probing(self):
+        return self._probe_lock.locked()
+
+    def _probe_one(self, proxy):
+        started = time.time()
+        working = test_proxy(proxy, timeout=PROXY_PROBE_TIMEOUT)
+        youtube_working = working and test_proxy_with_youtube(proxy, timeout=PROXY_PROBE_YOUTUBE_TIMEOUT)
+        return {
+            "proxy": proxy,
+            "working": working,
+            "youtube_working": youtube_working,
+            "probe_ms": round((time.time() - started) * 1000),
+            "probed_at": time.time()
+        }
+
+    def probe(self, proxies, deadline=None):
+        """Probe proxies in parallel, returning once all finish or the deadline passes.
+
+        Returns False without probing if another probe run is already in progress.
+        """
+        if not self._probe_lock.acquire(blocking=False):
+            return False
+        deadline = PROXY_PROBE_DEADLINE if deadline is None else deadline
+        self.last_probe_started = time.time()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(PROXY_PROBE_WORKERS, len(proxies))), thread_name_prefix="proxy-probe")
+        try:
+            futures = [executor.submit(self._probe_one, proxy) for proxy in proxies]
+            done, not_done = wait(futures, timeout=deadline)
+            with self._lock:
+                for future in done:
+                    if future.exception() is None:
+                        result = future.result()
+                        self._results[result["proxy"]] = result
+            self.last_probe_timed_out = len(not_done)
+        finally:
+            # Stragglers finish in the background; their results are simply not waited for
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.last_probe_duration = time.time() - self.last_probe_started
+            self._probe_lock.release()
+        return True
+
+    def probe_in_background(self, proxies):
+        threading.Thread(target=self.probe, args=(proxies,), name="proxy-prober", daemon=True).start()
+
+    def results(self, proxies=None):
+        """Latest probe results, optionally restricted to proxies still in the pool"""
+        with self._lock:
+            if proxies is None:
+                return list(self._results.values())
+            return [self._results[proxy] for proxy in proxies if proxy in self._results]
+
+    def stats(self):
+        return {
+            "probing": self.probing,
+            "last_probe_started": self.last_probe_started,
+            "last_probe_age_seconds": round(time.time() - self.last_probe_started) if self.last_probe_started else None,
+            "last_probe_duration_seconds": None if self.last_probe_duration is None else round(self.last_probe_duration, 3),
+            "last_probe_timed_out": self.last_probe_timed_out,
+            "sample_size": PROXY_PROBE_SAMPLE,
+            "deadline_seconds": PROXY_PROBE_DEADLINE
+        }
+
+PROXY_PROBER = ProxyProber()
+
+def proxy_probe_sample():
+    """The best-scored proxies, which are the ones requests will actually use"""
+    return [entry["proxy"] for entry in PROXY_POOL.snapshot()[:PROXY_PROBE_SAMPLE]]
 
 @app.route('/')
 def home():
     return jsonify({
         "message": "YouTube Transcript API Service",
         "usage": "/transcript?video_id=YOUR_VIDEO_ID",
+        "chunk_options": "chunk_duration, chunk_max_segments, chunk_max_words, chunk_overlap",
+        "output_options": "fields=metadata,full_text,segments,chunks; format=json|ndjson; stream=1",
+        "range_options": "start, end (seconds); offset, limit (segments within the range)",
+        "language_options": "languages=de,en (preference order, default en); translate=fr",
         "status": "running",
         "features": [
             "Automatic proxy fallback for blocked IPs",
@@ -169,8 +1251,14 @@ def home():
         ],
         "endpoints": {
             "/transcript": "Get YouTube video transcript",
+            "/transcript/languages": "List the transcript languages available for video_id",
+            "/transcript/multi": "Fetch several languages= of one video in parallel, translating from fallback= where needed",
+            "/transcripts": "POST {\"video_ids\": [...]} to stream many transcripts as NDJSON",
+            "/search": "Find q in one video (video_id=) or in every cached transcript, best matches (BM25, phrases first) first",
             "/health": "Service health check",
-            "/proxy-status": "Check proxy system status",
+            "/cache-stats": "Transcript cache and request coalescing counters",
+            "/metrics": "Prometheus metrics: per-stage latency histograms and counters",
+            "/proxy-status": "Check proxy system status (add ?refresh=1 to re-probe)",
             "/test-videos": "Get recommended video IDs for testing"
         },
         "note": "This service automatically tries proxies if direct connection fails",
@@ -186,33 +1274,130 @@ def health():
     return jsonify({
         "status": "healthy",
         "service": "youtube-transcript-api",
-        "timestamp": os.environ.get('RENDER_SERVICE_BUILD_COMMIT', 'local')
+        "timestamp": os.environ.get('RENDER_SERVICE_BUILD_COMMIT', 'local'),
+        "admission": {
+            "transcript_requests": ADMISSION_LIMITER.stats(),
+            "proxy_path": PROXY_PATH_LIMITER.stats(),
+            "rate_limit": RATE_LIMITER.stats()
+        }
+    })
+
+@app.route('/cache-stats')
+def cache_stats():
+    """Report transcript cache usage and request coalescing counters"""
+    return jsonify({
+        "cache": TRANSCRIPT_CACHE.stats(),
+        "sources": TRANSCRIPT_SOURCES.stats(),
+        "single_flight": TRANSCRIPT_FLIGHTS.stats(),
+        "http": HTTP_CACHE_STATS.stats(),
+        "search": TRANSCRIPT_SEARCH.stats(),
+        "negative_cache": FAILURE_CACHE.stats(),
+        "etags": TRANSCRIPT_DIGESTS.stats(),
+        "listings": TRANSCRIPT_LISTINGS.stats(),
+        "shared_store": SHARED_STORE.stats() if SHARED_STORE else None
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text-format metrics"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@METRICS.collector
+def _collect_service_metrics():
+    cache = TRANSCRIPT_CACHE.stats()
+    failures = FAILURE_CACHE.stats()
+    sources = TRANSCRIPT_SOURCES.stats()
+    listings = TRANSCRIPT_LISTINGS.stats()
+    flights = TRANSCRIPT_FLIGHTS.stats()
+    http_cache = HTTP_CACHE_STATS.stats()
+    fetch = FETCH_STATS.stats()
+    refresher = PROXY_REFRESHER.stats()
+    search = TRANSCRIPT_SEARCH.stats()
+    samples = [
+        ("cache_lookups_total", "counter", "Transcript cache lookups", cache["hits"], {"result": "hit"}),
+        ("cache_lookups_total", "counter", "Transcript cache lookups", cache["misses"], {"result": "miss"}),
+        ("cache_evictions_total", "counter", "Entries evicted to stay within cache limits", cache["evictions"], None),
+        ("cache_expirations_total", "counter", "Entries dropped after their TTL", cache["expirations"], None),
+        ("cache_entries", "gauge", "Transcripts currently cached", cache["entries"], None),
+        ("cache_bytes", "gauge", "Approximate size of cached transcripts", cache["bytes"], None),
+        ("source_cache_lookups_total", "counter", "Fetched transcript lookups on a processed cache miss", sources["hits"], {"result": "hit"}),
+        ("source_cache_lookups_total", "counter", "Fetched transcript lookups on a processed cache miss", sources["misses"], {"result": "miss"}),
+        ("negative_cache_hits_total", "counter", "Requests answered from cached permanent failures", failures["hits"], None),
+        ("negative_cache_entries", "gauge", "Videos remembered as permanently failing", failures["entries"], None),
+        ("listing_cache_lookups_total", "counter", "Transcript listing cache lookups", listings["hits"], {"result": "hit"}),
+        ("listing_cache_lookups_total", "counter", "Transcript listing cache lookups", listings["misses"], {"result": "miss"}),
+        ("coalesced_requests_total", "counter", "Requests that waited on another request's fetch", flights["coalesced_requests"], None),
+        ("coalesce_timeouts_total", "counter", "Coalesced waiters that gave up", flights["waiter_timeouts"], None),
+        ("search_indexed_videos", "gauge", "Videos in the cross-transcript search index", search["videos"], None),
+        ("search_queries_total", "counter", "Searches across all cached transcripts", search["queries"], None),
+        ("http_not_modified_total", "counter", "Conditional GETs answered with 304", http_cache["not_modified"], None),
+        ("stored_body_lookups_total", "counter", "Stored response body lookups", http_cache["stored_body_hits"], {"result": "hit"}),
+        ("stored_body_lookups_total", "counter", "Stored response body lookups", http_cache["stored_body_misses"], {"result": "miss"}),
+        ("direct_fetch_total", "counter", "Direct fetch outcomes", fetch["direct_wins"], {"outcome": "success"}),
+        ("direct_fetch_total", "counter", "Direct fetch outcomes", fetch["direct_blocked"], {"outcome": "blocked"}),
+        ("direct_fetch_total", "counter", "Direct fetch outcomes", fetch["direct_errors"], {"outcome": "error"}),
+        ("direct_fetch_skipped_total", "counter", "Fetches sent straight to proxies while the direct path was blocked", fetch["direct_skipped"], None),
+        ("direct_path_blocked", "gauge", "1 while the direct path is treated as blocked", int(fetch["direct_path"]["blocked"]), None),
+        ("proxy_attempts_total", "counter", "Transcript fetches attempted through a proxy", fetch["proxy_attempts"], None),
+        ("proxy_hedged_attempts_total", "counter", "Proxy attempts launched while another attempt was still running", fetch["hedged_attempts"], None),
+        ("proxy_pretests_skipped_total", "counter", "Proxy pre-tests skipped for recently good proxies", fetch["pretests_skipped"], None),
+        ("proxy_wins_total", "counter", "Transcripts delivered through a proxy", fetch["proxy_wins"], None),
+        ("fetch_failures_total", "counter", "Requests for which no transcript could be fetched", fetch["failures"], None),
+        ("fetch_deadline_exceeded_total", "counter", "Fetches cut off by FETCH_DEADLINE", fetch["deadline_exceeded"], None),
+        ("proxy_refreshes_total", "counter", "Proxy list refreshes", refresher["refresh_count"], None),
+        ("proxy_pool_size", "gauge", "Proxies in the pool", len(PROXY_POOL), None),
+        ("proxy_pool_available", "gauge", "Proxies not quarantined", PROXY_POOL.available_count(), None),
+    ]
+    if SHARED_STORE:
+        shared = SHARED_STORE.stats()
+        samples.extend([
+            ("shared_store_lookups_total", "counter", "Transcript lookups in the cross-worker store", shared["transcript_hits"], {"result": "hit"}),
+            ("shared_store_lookups_total", "counter", "Transcript lookups in the cross-worker store", shared["transcript_misses"], {"result": "miss"}),
+            ("shared_store_errors_total", "counter", "Failed cross-worker store operations", shared["errors"], None),
+        ])
+    if refresher["last_refresh_duration_seconds"] is not None:
+        samples.append(("proxy_refresh_duration_seconds", "gauge", "Duration of the last proxy refresh", refresher["last_refresh_duration_seconds"], None))
+    if refresher["list_age_seconds"] is not None:
+        samples.append(("proxy_list_age_seconds", "gauge", "Seconds since the proxy list was last replaced", refresher["list_age_seconds"], None))
+    for name, limiter in (("transcript_requests", ADMISSION_LIMITER), ("proxy_path", PROXY_PATH_LIMITER)):
+        stats = limiter.stats()
+        samples.extend([
+            ("admission_active", "gauge", "Requests holding a concurrency slot", stats["active"], {"limiter": name}),
+            ("admission_waiting", "gauge", "Requests queued for a concurrency slot", stats["waiting"], {"limiter": name}),
+            ("admission_rejected_total", "counter", "Requests turned away for lack of capacity", stats["rejected"], {"limiter": name}),
+        ])
+    samples.append(("rate_limited_total", "counter", "Requests rejected by per-client rate limits", RATE_LIMITER.stats()["limited"], None))
+    return samples
+
 @app.route('/proxy-status')
 def proxy_status():
-    """Check proxy system status"""
+    """Check proxy system status from the latest probe results (?refresh=1 probes again first)"""
     update_proxy_list()
     
-    # Test a few proxies
-    working_proxies = 0
-    youtube_working_proxies = 0
-    if PROXY_LIST:
-        test_sample = PROXY_LIST[:10]  # Test first 10 proxies
-        for proxy in test_sample:
-            if test_proxy(proxy):
-                working_proxies += 1
-                if test_proxy_with_youtube(proxy):
-                    youtube_working_proxies += 1
+    proxies = PROXY_POOL.proxies()
+    if proxies and request.args.get('refresh') == '1':
+        PROXY_PROBER.probe(proxy_probe_sample())
+    elif proxies and not PROXY_PROBER.last_probe_started:
+        PROXY_PROBER.probe_in_background(proxy_probe_sample())
+    
+    probe_results = PROXY_PROBER.results(proxies)
+    working_proxies = sum(1 for result in probe_results if result["working"])
+    youtube_working_proxies = sum(1 for result in probe_results if result["youtube_working"])
     
     return jsonify({
-        "total_proxies": len(PROXY_LIST),
-        "tested_proxies": min(10, len(PROXY_LIST)),
+        "total_proxies": len(proxies),
+        "available_proxies": PROXY_POOL.available_count(),
+        "tested_proxies": len(probe_results),
         "working_proxies": working_proxies,
         "youtube_working_proxies": youtube_working_proxies,
-        "proxy_system": "enabled" if PROXY_LIST else "no_proxies_available",
+        "proxy_system": "enabled" if proxies else "no_proxies_available",
+        "proxy_scores": PROXY_POOL.snapshot(),
+        "probe": {**PROXY_PROBER.stats(), "results": probe_results},
         "last_update": LAST_PROXY_UPDATE,
         "next_update": LAST_PROXY_UPDATE + PROXY_UPDATE_INTERVAL,
+        "refresher": PROXY_REFRESHER.stats(),
+        "http_sessions": HTTP_SESSIONS.stats(),
+        "fetch": FETCH_STATS.stats(),
         "recommendation": "youtube_working_proxies > 0" if youtube_working_proxies > 0 else "try_different_videos"
     })
 
@@ -253,233 +1438,1381 @@ def test_videos():
         "tip": "Educational and historical content usually has higher success rates"
     })
 
-def process_transcript(video_id):
-    try:
-        # Try direct connection first
-        transcript_data = None
-        error_occurred = None
-        
-        try:
-            print(f"Attempting direct connection for video: {video_id}")
-            ytt_api = YouTubeTranscriptApi()
-            fetched_transcript = ytt_api.fetch(video_id)
-            transcript_data = fetched_transcript.to_raw_data()
-            print("Direct connection successful!")
-            
-        except Exception as e:
-            error_occurred = e
-            error_msg = str(e).lower()
-            print(f"Direct connection failed: {error_msg}")
-            
-            # If blocked, try with proxies
-            if any(keyword in error_msg for keyword in ["blocked", "ip", "cloud provider", "requests from your ip"]):
-                print("Attempting to use proxy...")
-                
-                # Get fresh proxy list
-                update_proxy_list()
-                
-                if not PROXY_LIST:
-                    print("No proxies available")
-                else:
-                    print(f"Available proxies: {len(PROXY_LIST)}")
-                    
-                    # Try up to 5 different proxies with better selection
-                    successful_proxy = None
-                    for attempt in range(min(5, len(PROXY_LIST))):
-                        proxy = get_random_proxy()
-                        if not proxy:
-                            continue
-                            
-                        print(f"Trying proxy {attempt + 1}/5: {proxy}")
-                        
-                        # Test proxy with YouTube specifically
-                        if not test_proxy_with_youtube(proxy):
-                            print(f"Proxy {proxy} failed YouTube test, trying next...")
-                            continue
-                        
-                        try:
-                            # Enhanced proxy implementation with better headers
-                            import requests
-                            
-                            # User agents for rotation
-                            user_agents = [
-                                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                                'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                                'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                                'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'
-                            ]
-                            
-                            # Create a custom session with proxy and headers
-                            session = requests.Session()
-                            session.proxies = {
-                                "http": f"http://{proxy}",
-                                "https": f"http://{proxy}"
-                            }
-                            session.headers.update({
-                                'User-Agent': random.choice(user_agents),
-                                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                                'Accept-Language': 'en-US,en;q=0.9',
-                                'Accept-Encoding': 'gzip, deflate',
-                                'Connection': 'keep-alive',
-                                'Upgrade-Insecure-Requests': '1',
-                            })
-                            
-                            # Monkey patch the session (enhanced)
-                            original_get = requests.get
-                            original_post = requests.post
-                            
-                            def patched_get(*args, **kwargs):
-                                kwargs['proxies'] = session.proxies
-                                kwargs['headers'] = {**session.headers, **kwargs.get('headers', {})}
-                                kwargs['timeout'] = 20
-                                return original_get(*args, **kwargs)
-                            
-                            def patched_post(*args, **kwargs):
-                                kwargs['proxies'] = session.proxies
-                                kwargs['headers'] = {**session.headers, **kwargs.get('headers', {})}
-                                kwargs['timeout'] = 20
-                                return original_post(*args, **kwargs)
-                            
-                            requests.get = patched_get
-                            requests.post = patched_post
-                            
-                            # Add small delay to avoid rate limiting
-                            time.sleep(random.uniform(1, 3))
-                            
-                            # Try with proxy
-                            ytt_api = YouTubeTranscriptApi()
-                            fetched_transcript = ytt_api.fetch(video_id)
-                            transcript_data = fetched_transcript.to_raw_data()
-                            
-                            # Restore original functions
-                            requests.get = original_get
-                            requests.post = original_post
-                            
-                            successful_proxy = proxy
-                            print(f"Proxy {proxy} worked successfully!")
-                            break
-                            
-                        except Exception as proxy_error:
-                            print(f"Proxy {proxy} failed during transcript fetch: {str(proxy_error)}")
-                            # Restore original functions in case of error
-                            try:
-                                requests.get = original_get
-                                requests.post = original_post
-                            except:
-                                pass
-                            continue
-                
-                # If all proxies failed
-                if transcript_data is None:
-                    return {
-                        "success": False,
-                        "error": "YouTube is blocking requests from this cloud server and all available proxies failed.",
-                        "suggestion": "Try different videos or wait a few minutes. Some videos may work better than others.",
-                        "technical_info": "Cloud providers like Render, Heroku, AWS are often blocked by YouTube's anti-bot measures.",
-                        "solutions": [
-                            "Try testing with different video IDs",
-                            "Some videos work better than others", 
-                            "Wait 10-15 minutes and try again",
-                            "Try videos that are more popular or educational content",
-                            "Consider using a VPS with residential IP instead of cloud hosting"
-                        ],
-                        "video_id": video_id,
-                        "proxy_attempts": f"Tried {min(5, len(PROXY_LIST))} proxies but all failed",
-                        "available_proxies": len(PROXY_LIST)
-                    }, 503
-            
-            # Handle other types of errors
-            elif "transcript" in error_msg and ("disabled" in error_msg or "not available" in error_msg):
-                return {
-                    "success": False,
-                    "error": "Transcripts are not available for this video",
-                    "video_id": video_id
-                }, 404
-            else:
-                return {
-                    "success": False,
-                    "error": f"Error retrieving transcript: {str(error_occurred)}",
-                    "video_id": video_id
-                }, 500
-        
-        # Create time-based chunks with smart grouping
-        target_chunk_duration = 30  # Target 30 seconds per chunk
-        chunks = []
-        current_segments = []
-        
-        for i, segment in enumerate(transcript_data):
-            current_segments.append(segment)
+# Admission control
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 8))  # Transcript requests served at once
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 16))  # Requests allowed to wait for a slot
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 2))  # Seconds a request may wait
+PROXY_PATH_MAX_CONCURRENT = int(os.environ.get('PROXY_PATH_MAX_CONCURRENT', 2))  # Requests in the proxy fallback at once
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 60))  # Per client; 0 disables rate limiting
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 20))
+RATE_LIMIT_MAX_CLIENTS = 10000  # Buckets kept before the least recently seen clients are forgotten
+OVERLOAD_RETRY_AFTER = 2  # Seconds suggested to clients turned away for lack of capacity
+
+class ConcurrencyLimiter:
+    """Caps concurrent work, letting a bounded number of callers wait briefly for a slot"""
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self, timeout=0):
+        with self._cond:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if timeout <= 0 or self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
             
-            # Create a chunk when we reach target duration, have enough context, or it's the last segment
-            if sum(seg['duration'] for seg in current_segments) >= target_chunk_duration or \
-               len(current_segments) >= 5 or \
-               i == len(transcript_data) - 1:
-                
-                chunk_text = " ".join(seg['text'] for seg in current_segments)
-                start_time = current_segments[0]['start']
-                end_time = current_segments[-1]['start'] + current_segments[-1]['duration']
-                duration = float(end_time) - float(start_time)
-                
-                # Format timestamp once and reuse
-                start_formatted = f"{int(start_time)//60:02d}:{int(start_time)%60:02d}"
-                end_formatted = f"{int(end_time)//60:02d}:{int(end_time)%60:02d}"
-                
-                # Calculate words for analytics
-                words = chunk_text.split()
-                
-                chunk = {
-                    "id": len(chunks),
-                    "text": chunk_text,
-                    "timestamp": {
-                        "start": int(start_time),
-                        "end": int(end_time),
-                        "duration": round(duration, 2),
-                        "formatted": f"{start_formatted} - {end_formatted}"
-                    },
-                    "analytics": {
-                        "word_count": len(words),
-                        "speaking_rate": round(len(words) / duration, 2) if duration > 0 else 0
-                    },
-                    "embedding_text": f"At {start_formatted} to {end_formatted}: {chunk_text}"
-                }
-                
-                chunks.append(chunk)
-                current_segments = []
+            self.waiting += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
 
-        response = {
-            "success": True,
-            "data": {
-                "video_id": video_id,
-                "metadata": {
-                    "total_segments": len(transcript_data),
-                    "total_chunks": len(chunks),
-                    "duration": transcript_data[-1]['start'] + transcript_data[-1]['duration'],
-                    "language": "en"
-                },
-                "transcript": {
-                    "full_text": " ".join(segment['text'] for segment in transcript_data),
-                    "segments": [
-                        {
-                            "id": i,
-                            "text": segment['text'],
-                            "start": segment['start'],
-                            "duration": segment['duration'],
-                            "timestamp": {
-                                "seconds": int(segment['start']),
-                                "formatted": f"{int(segment['start'])//60:02d}:{int(segment['start'])%60:02d}"
-                            }
-                        }
-                        for i, segment in enumerate(transcript_data)
-                    ],
-                    "chunks": chunks
-                }
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected
             }
-        }
-        return response
-    except Exception as e:
+
+class RateLimiter:
+    """Per-client token buckets refilled at rate_per_minute, holding at most `burst` tokens"""
+
+    def __init__(self, rate_per_minute, burst, max_clients):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, last refill time)
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def consume(self, client, cost=1):
+        """Take `cost` tokens from the client's bucket; returns 0 if allowed, else seconds until it would be"""
+        if self.rate <= 0:
+            return 0
+        cost = min(cost, self.burst)  # A large batch costs at most a full bucket
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            retry_after = 0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / self.rate
+                self.limited += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_minute": self.rate * 60,
+                "burst": self.burst,
+                "tracked_clients": len(self._buckets),
+                "limited": self.limited
+            }
+
+ADMISSION_LIMITER = ConcurrencyLimiter(ADMISSION_MAX_CONCURRENT, ADMISSION_QUEUE_SIZE)
+PROXY_PATH_LIMITER = ConcurrencyLimiter(PROXY_PATH_MAX_CONCURRENT, 0)
+RATE_LIMITER = RateLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS)
+
+def client_id():
+    """Identify the caller by the address the trusted proxy saw (ProxyFix rewrites remote_addr)"""
+    return request.remote_addr or 'unknown'
+
+def rejection_response(status, error, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({
+        "success": False,
+        "error": error,
+        "retry_after": retry_after
+    })
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def error_response(body, status):
+    """JSON error response, passing a retry hint on as a Retry-After header"""
+    response = jsonify(body)
+    response.status_code = status
+    if "retry_after" in body:
+        response.headers['Retry-After'] = str(body["retry_after"])
+    return response
+
+def admission_controlled(cost=None):
+    """Rate-limit the client and hold a concurrency slot for the whole response, including streaming.
+
+    `cost` optionally computes how many rate-limit tokens the current request uses.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            retry_after = RATE_LIMITER.consume(client_id(), cost() if cost else 1)
+            if retry_after:
+                return rejection_response(429, "Rate limit exceeded for this client", retry_after)
+            if not ADMISSION_LIMITER.acquire(ADMISSION_QUEUE_TIMEOUT):
+                return rejection_response(503, "Server is at capacity, retry shortly", OVERLOAD_RETRY_AFTER)
+            
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                ADMISSION_LIMITER.release()
+                raise
+            response.call_on_close(ADMISSION_LIMITER.release)
+            return response
+        return wrapper
+    return decorator
+
+# Language negotiation
+DEFAULT_LANGUAGES = ('en',)
+DEFAULT_LANGUAGE_OPTIONS = {"languages": DEFAULT_LANGUAGES, "translate": None}
+MAX_LANGUAGES = 10  # Codes accepted in one languages= list
+LISTING_CACHE_MAX_ENTRIES = int(os.environ.get('LISTING_CACHE_MAX_ENTRIES', 4096))
+LISTING_CACHE_TTL = int(os.environ.get('LISTING_CACHE_TTL', 1800))  # Seconds; caption URLs in a listing expire after a few hours
+_LANGUAGE_CODE_RE = re.compile(r"^[A-Za-z]{2,3}(-[A-Za-z0-9]{1,8})*$")
+
+def parse_language_options(params):
+    """Read languages= (preference order, comma-separated or a JSON list) and translate= from a request.
+
+    Returns (options, error) with options always holding both keys so equal settings give equal cache keys.
+    """
+    languages = params.get('languages')
+    if languages in (None, ''):
+        languages = DEFAULT_LANGUAGES
+    elif isinstance(languages, str):
+        languages = tuple(code.strip() for code in languages.split(',') if code.strip())
+    elif isinstance(languages, list) and all(isinstance(code, str) for code in languages):
+        languages = tuple(code.strip() for code in languages)
+    else:
+        return None, "languages must be a comma-separated list of language codes"
+    translate = params.get('translate') or None
+    
+    if not languages or len(languages) > MAX_LANGUAGES:
+        return None, f"languages must list between 1 and {MAX_LANGUAGES} language codes"
+    invalid = [code for code in languages + ((translate,) if translate else ()) if not isinstance(code, str) or not _LANGUAGE_CODE_RE.match(code)]
+    if invalid:
+        return None, f"Invalid language code: {', '.join(map(str, invalid))}"
+    return {"languages": tuple(dict.fromkeys(languages)), "translate": translate}, None
+
+# Transcript listings per video: which languages exist, which are generated, what they translate to
+TRANSCRIPT_LISTINGS = TranscriptCache(LISTING_CACHE_MAX_ENTRIES, LISTING_CACHE_MAX_ENTRIES, LISTING_CACHE_TTL)  # Sized by count
+LISTING_FLIGHTS = SingleFlight()
+
+def list_transcripts(video_id, http_client, proxy=None):
+    """Return the video's TranscriptList, from the cache or fetched once through http_client"""
+    listing = TRANSCRIPT_LISTINGS.get(video_id)
+    if listing is not None:
+        return listing, True
+    
+    def fetch_listing():
+        with timed_stage('list_transcripts'):
+            listing = YouTubeTranscriptApi(http_client=http_client).list(video_id)
+        TRANSCRIPT_LISTINGS.set(video_id, listing, 1)
+        return listing
+    
+    # Parallel language fetches for one video share a single listing call per path
+    return LISTING_FLIGHTS.do((video_id, proxy), fetch_listing, timeout=HTTP_TIMEOUT * 2), False
+
+def list_with_client(video_id, http_client, proxy=None):
+    """fetch_transcript_data fetcher that only lists; returns (listing, http_client) so the winning session can be reused"""
+    return list_transcripts(video_id, http_client, proxy)[0], http_client
+
+def choose_transcript(listing, language_options):
+    """Pick the first available language in preference order; returns (source, transcript), translated if asked"""
+    source = listing.find_transcript(language_options["languages"])
+    target = language_options["translate"]
+    if target and target != source.language_code:
+        return source, source.translate(target)
+    return source, source
+
+def describe_listing(listing):
+    """Public summary of a TranscriptList"""
+    return [{
+        "language": transcript.language_code,
+        "language_name": transcript.language,
+        "is_generated": transcript.is_generated,
+        "is_translatable": transcript.is_translatable,
+        "translation_languages": [language.language_code for language in transcript.translation_languages]
+    } for transcript in listing]
+
+def fetch_with_client(video_id, http_client, language_options, proxy=None):
+    """Negotiate a language and fetch that transcript through http_client; returns (segments, language)"""
+    listing, cached = list_transcripts(video_id, http_client, proxy)
+    source, transcript = choose_transcript(listing, language_options)
+    translated_from = source.language_code if transcript is not source else None
+    # Listed transcripts keep the session they were listed with; fetch through this attempt's session
+    transcript = Transcript(http_client, video_id, transcript._url, transcript.language, transcript.language_code,
+                            transcript.is_generated, transcript.translation_languages)
+    try:
+        fetched = transcript.fetch()
+    except YouTubeRequestFailed:
+        if not cached:
+            raise
+        # The cached listing's caption URL may have expired: list again and retry once
+        TRANSCRIPT_LISTINGS.discard(video_id)
+        return fetch_with_client(video_id, http_client, language_options, proxy)
+    
+    language = {
+        "language": fetched.language_code,
+        "language_name": fetched.language,
+        "is_generated": fetched.is_generated,
+        "translated_from": translated_from
+    }
+    return fetched.to_raw_data(), language
+
+# Hedged fetching
+FETCH_MODE = os.environ.get('FETCH_MODE', 'hedged')  # 'hedged' races proxies, 'sequential' tries one at a time
+FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', 45))  # Overall budget for getting a transcript, in seconds
+HEDGE_DELAY = float(os.environ.get('HEDGE_DELAY', 3))  # Seconds before launching another parallel attempt
+HEDGE_FANOUT = int(os.environ.get('HEDGE_FANOUT', 3))  # Proxy attempts allowed in flight at once
+PROXY_MAX_ATTEMPTS = int(os.environ.get('PROXY_MAX_ATTEMPTS', 5))  # Proxies tried per request
+PROXY_PRETEST_SKIP_WINDOW = float(os.environ.get('PROXY_PRETEST_SKIP_WINDOW', 300))  # Trust recent successes this long
+DIRECT_BLOCK_COOLDOWN = float(os.environ.get('DIRECT_BLOCK_COOLDOWN', 120))  # Seconds to go straight to proxies after a block
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 32))
+
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+class FetchStats:
+    """Counts which path (direct or proxy) ended up providing each transcript"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.direct_wins = 0
+        self.direct_blocked = 0
+        self.direct_errors = 0
+        self.proxy_wins = 0
+        self.failures = 0
+        self.proxy_attempts = 0
+        self.hedged_attempts = 0
+        self.pretests_skipped = 0
+        self.deadline_exceeded = 0
+        self.direct_skipped = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def stats(self):
+        with self._lock:
+            wins = self.direct_wins + self.proxy_wins
+            return {
+                "mode": FETCH_MODE,
+                "direct_wins": self.direct_wins,
+                "direct_blocked": self.direct_blocked,
+                "direct_errors": self.direct_errors,
+                "proxy_wins": self.proxy_wins,
+                "direct_win_rate": round(self.direct_wins / wins, 4) if wins else 0,
+                "proxy_win_rate": round(self.proxy_wins / wins, 4) if wins else 0,
+                "failures": self.failures,
+                "proxy_attempts": self.proxy_attempts,
+                "hedged_attempts": self.hedged_attempts,
+                "pretests_skipped": self.pretests_skipped,
+                "deadline_exceeded": self.deadline_exceeded,
+                "direct_skipped": self.direct_skipped,
+                "direct_path": DIRECT_PATH.stats()
+            }
+
+FETCH_STATS = FetchStats()
+
+class DirectPathState:
+    """Remembers that YouTube blocked our own IP so requests skip the direct attempt for a while"""
+
+    def __init__(self, cooldown):
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.blocked_until = 0.0
+        self.blocks = 0
+
+    def mark_blocked(self):
+        with self._lock:
+            self.blocked_until = time.time() + self.cooldown
+            self.blocks += 1
+
+    def mark_working(self):
+        with self._lock:
+            self.blocked_until = 0.0
+
+    def is_blocked(self):
+        return time.time() < self.blocked_until
+
+    def stats(self):
+        with self._lock:
+            remaining = self.blocked_until - time.time()
+            return {
+                "blocked": remaining > 0,
+                "blocked_for_seconds": round(remaining, 1) if remaining > 0 else 0,
+                "cooldown_seconds": self.cooldown,
+                "blocks": self.blocks
+            }
+
+DIRECT_PATH = DirectPathState(DIRECT_BLOCK_COOLDOWN)
+
+class ProxyBudgetExhausted(Exception):
+    """Too many requests are already in the proxy fallback for this one to join"""
+
+class ProxiesExhausted(Exception):
+    """The direct fetch was blocked and no proxy produced a transcript in time"""
+
+    def __init__(self, tried_proxies, timed_out=False):
+        super().__init__(f"Tried {len(tried_proxies)} proxies but all failed")
+        self.tried_proxies = tried_proxies
+        self.timed_out = timed_out
+
+# Failures that will not change on retry, with the message clients get (in order; the first match wins)
+PERMANENT_ERRORS = (
+    (TranscriptsDisabled, "Transcripts are not available for this video"),
+    (NoTranscriptFound, "Transcripts are not available for this video"),
+    (InvalidVideoId, "This is not a valid YouTube video ID"),
+    (AgeRestricted, "This video is age restricted"),
+    (VideoUnavailable, "This video is no longer available"),
+    (VideoUnplayable, "This video cannot be played"),
+    (NotTranslatable, "This transcript cannot be translated"),
+    (TranslationLanguageNotAvailable, "Translation to the requested language is not available"),
+)
+
+def classify_fetch_error(error):
+    """'blocked' when YouTube refused our IP, 'permanent' when the video itself has no transcript, else 'transient'"""
+    if isinstance(error, RequestBlocked):  # Includes IpBlocked (HTTP 429)
+        return 'blocked'
+    if permanent_error_message(error) is not None:
+        return 'permanent'
+    return 'transient'
+
+def permanent_error_message(error):
+    for error_type, message in PERMANENT_ERRORS:
+        if isinstance(error, error_type):
+            return message
+    return None
+
+def _fetch_direct(video_id, fetcher):
+    with timed_stage('direct_fetch'):
+        return fetcher(video_id, HTTP_SESSIONS.get(), None)
+
+def _fetch_via_proxy(video_id, fetcher, proxy):
+    # Proxies that just worked skip the YouTube pre-test; the fetch itself is the test
+    if PROXY_POOL.recently_succeeded(proxy, PROXY_PRETEST_SKIP_WINDOW):
+        FETCH_STATS.incr("pretests_skipped")
+    else:
+        with timed_stage('proxy_pretest'):
+            passed = test_proxy_with_youtube(proxy)
+        if not passed:
+            raise Exception(f"Proxy {proxy} failed YouTube test")
+    
+    fetch_started = time.time()
+    try:
+        with timed_stage('proxy_fetch'):
+            fetched = fetcher(video_id, HTTP_SESSIONS.get(proxy), proxy)
+    except Exception as e:
+        # A definitive "no transcript" answer means the proxy itself did its job
+        if classify_fetch_error(e) == 'permanent':
+            PROXY_POOL.record_success(proxy, time.time() - fetch_started)
+        else:
+            PROXY_POOL.record_failure(proxy)
+        raise
+    PROXY_POOL.record_success(proxy, time.time() - fetch_started)
+    return fetched
+
+def fetch_transcript_data(video_id, language_options=None, fetcher=None):
+    """Fetch raw transcript data directly, falling back to (possibly parallel) proxy attempts.
+
+    In hedged mode the HEDGE_FANOUT best-scored proxies are launched together as soon
+    as the direct fetch is blocked or has taken longer than HEDGE_DELAY, and a failed
+    attempt is replaced by the next best proxy right away. The first transcript wins
+    and the other attempts are ignored. In sequential mode proxies, picked weighted by
+    score, are tried one at a time, only after the direct fetch was blocked.
+
+    Proxy attempts also need one of the PROXY_PATH_MAX_CONCURRENT proxy-path slots.
+    Without a slot a slow direct fetch is simply not hedged, and a blocked one raises
+    ProxyBudgetExhausted instead of queueing.
+    
+    After a block the direct attempt is skipped for DIRECT_BLOCK_COOLDOWN seconds, as
+    long as there are proxies to use instead.
+    
+    fetcher(video_id, http_client, proxy) does the upstream work of one attempt; by
+    default it negotiates a transcript under language_options and returns
+    (segments, language).
+    
+    Returns (result, proxy), with proxy None for a direct win. Errors that
+    are not blocks are re-raised: permanent ones from any attempt, transient ones from
+    the direct fetch. ProxiesExhausted is raised when every attempt failed or
+    FETCH_DEADLINE passed.
+    """
+    if fetcher is None:
+        language_options = language_options or DEFAULT_LANGUAGE_OPTIONS
+        fetcher = lambda video_id, http_client, proxy: fetch_with_client(video_id, http_client, language_options, proxy)
+    hedged = FETCH_MODE == 'hedged'
+    fanout = max(1, HEDGE_FANOUT) if hedged else 1
+    deadline = time.time() + FETCH_DEADLINE
+    
+    attempts = {}  # future -> proxy (None for direct)
+    direct_blocked = DIRECT_PATH.is_blocked() and PROXY_POOL.available_count() > 0
+    if direct_blocked:
+        print(f"Direct path recently blocked; going straight to proxies for video: {video_id}")
+        FETCH_STATS.incr("direct_skipped")
+    else:
+        print(f"Attempting direct connection for video: {video_id}")
+        attempts[submit_with_context(FETCH_EXECUTOR, _fetch_direct, video_id, fetcher)] = None
+    pending = set(attempts)
+    tried_proxies = []
+    proxies_exhausted = False
+    proxy_budget_held = False
+    hedging = False  # Set once proxies joined the race; from then on it is kept HEDGE_FANOUT wide
+    next_hedge = time.time() + HEDGE_DELAY
+    
+    try:
+        while True:
+            now = time.time()
+            if now >= deadline:
+                FETCH_STATS.incr("deadline_exceeded")
+                break
+            
+            # Launch proxy attempts if the race allows it
+            proxies_in_flight = sum(1 for future in pending if attempts[future] is not None)
+            room = min(fanout - proxies_in_flight, PROXY_MAX_ATTEMPTS - len(tried_proxies))
+            may_use_proxies = direct_blocked or hedging or (hedged and now >= next_hedge)
+            if may_use_proxies and not proxies_exhausted and room > 0:
+                if not proxy_budget_held:
+                    proxy_budget_held = PROXY_PATH_LIMITER.acquire()
+                    if not proxy_budget_held and direct_blocked:
+                        FETCH_STATS.incr("failures")
+                        raise ProxyBudgetExhausted()
+                
+                if not proxy_budget_held:
+                    next_hedge = now + HEDGE_DELAY  # Proxy path is busy; keep waiting on direct for now
+                else:
+                    if hedged:
+                        update_proxy_list()
+                        proxies = PROXY_POOL.best(room, exclude=set(tried_proxies))
+                    else:
+                        proxies = [proxy for proxy in (get_random_proxy(exclude=set(tried_proxies)),) if proxy]
+                    if not proxies:
+                        proxies_exhausted = True
+                        if not tried_proxies:
+                            print("No proxies available")
+                    for proxy in proxies:
+                        tried_proxies.append(proxy)
+                        print(f"Trying proxy {len(tried_proxies)}/{PROXY_MAX_ATTEMPTS}: {proxy}")
+                        if pending:
+                            FETCH_STATS.incr("hedged_attempts")
+                        future = submit_with_context(FETCH_EXECUTOR, _fetch_via_proxy, video_id, fetcher, proxy)
+                        attempts[future] = proxy
+                        pending.add(future)
+                        FETCH_STATS.incr("proxy_attempts")
+                    hedging = hedging or (hedged and bool(proxies))
+            
+            if not pending:
+                break
+            
+            # Wake up for the next finished attempt, the next hedge, or the deadline
+            timeout = deadline - now
+            if hedged and not hedging and not proxies_exhausted and len(tried_proxies) < PROXY_MAX_ATTEMPTS:
+                timeout = min(timeout, max(next_hedge - now, 0.01))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                proxy = attempts[future]
+                try:
+                    fetched = future.result()
+                except Exception as e:
+                    kind = classify_fetch_error(e)
+                    if proxy is None:
+                        print(f"Direct connection failed ({kind}): {str(e).lower()}")
+                        if kind != 'blocked':
+                            FETCH_STATS.incr("direct_errors")
+                            FETCH_STATS.incr("failures")
+                            raise
+                        FETCH_STATS.incr("direct_blocked")
+                        DIRECT_PATH.mark_blocked()
+                        direct_blocked = True
+                        print("Attempting to use proxy...")
+                    else:
+                        print(f"Proxy {proxy} failed ({kind}): {str(e)}")
+                        if kind == 'permanent':  # Another proxy would get the same answer
+                            FETCH_STATS.incr("failures")
+                            raise
+                    continue
+                
+                if proxy is None:
+                    print("Direct connection successful!")
+                    DIRECT_PATH.mark_working()
+                    FETCH_STATS.incr("direct_wins")
+                else:
+                    print(f"Proxy {proxy} worked successfully!")
+                    FETCH_STATS.incr("proxy_wins")
+                return fetched, proxy
+    finally:
+        # Losing attempts that have not started yet are dropped; running ones are ignored
+        for future in pending:
+            future.cancel()
+        if proxy_budget_held:
+            PROXY_PATH_LIMITER.release()
+    
+    FETCH_STATS.incr("failures")
+    raise ProxiesExhausted(tried_proxies, timed_out=time.time() >= deadline)
+
+# Chunking
+DEFAULT_CHUNK_OPTIONS = {
+    "chunk_duration": 30.0,  # Target seconds per chunk
+    "chunk_max_segments": 5,
+    "chunk_max_words": None,  # No word cap unless asked for
+    "chunk_overlap": 0  # Segments repeated from the end of the previous chunk
+}
+MAX_CHUNK_DURATION = 3600
+
+def parse_chunk_options(params):
+    """Read chunking options from query parameters (or a JSON body).
+
+    Returns (options, error) where options always holds every key of
+    DEFAULT_CHUNK_OPTIONS so equal settings give equal cache keys.
+    """
+    options = dict(DEFAULT_CHUNK_OPTIONS)
+    try:
+        if params.get('chunk_duration') not in (None, ''):
+            options['chunk_duration'] = float(params.get('chunk_duration'))
+        for name in ('chunk_max_segments', 'chunk_max_words', 'chunk_overlap'):
+            if params.get(name) not in (None, ''):
+                options[name] = int(params.get(name))
+    except (TypeError, ValueError):
+        return None, "Chunk options must be numbers"
+    
+    if not 0 < options['chunk_duration'] <= MAX_CHUNK_DURATION:
+        return None, f"chunk_duration must be between 0 and {MAX_CHUNK_DURATION} seconds"
+    if options['chunk_max_segments'] < 1:
+        return None, "chunk_max_segments must be at least 1"
+    if options['chunk_max_words'] is not None and options['chunk_max_words'] < 1:
+        return None, "chunk_max_words must be at least 1"
+    if not 0 <= options['chunk_overlap'] < options['chunk_max_segments']:
+        return None, "chunk_overlap must be at least 0 and smaller than chunk_max_segments"
+    return options, None
+
+def format_timestamp(seconds):
+    return f"{int(seconds)//60:02d}:{int(seconds)%60:02d}"
+
+def iter_chunk_ranges(segments, chunk_duration=30.0, chunk_max_segments=5, chunk_max_words=None, chunk_overlap=0):
+    """Yield (start, end) segment index ranges for time-based chunks in a single pass.
+
+    A chunk closes once its segments add up to chunk_duration seconds, hold
+    chunk_max_segments segments, or are the last ones. With chunk_max_words a chunk
+    also closes before a segment that would push it over the word cap. Each chunk
+    after the first starts with the last chunk_overlap segments of the previous one
+    but always contains at least one new segment.
+    """
+    total = len(segments)
+    chunk_overlap = min(chunk_overlap, chunk_max_segments - 1)
+    word_counts = [len(segment['text'].split()) for segment in segments] if chunk_max_words else None
+    
+    start = 0  # First segment of the current chunk
+    fresh = 0  # First segment not already emitted in an earlier chunk
+    duration_total = 0.0
+    word_total = 0
+    i = 0
+    while i < total:
+        if word_counts and i > fresh and word_total + word_counts[i] > chunk_max_words:
+            end = i  # Segment i would overflow the word cap, so it opens the next chunk
+        else:
+            duration_total += segments[i]['duration']
+            if word_counts:
+                word_total += word_counts[i]
+            i += 1
+            if duration_total < chunk_duration and i - start < chunk_max_segments and i < total:
+                continue
+            end = i
+        
+        yield start, end
+        
+        # Carry the overlap into the next chunk; totals only cover those few segments
+        start = max(end - chunk_overlap, start + 1) if end < total else end
+        fresh = end
+        duration_total = sum(segments[j]['duration'] for j in range(start, end))
+        word_total = sum(word_counts[j] for j in range(start, end)) if word_counts else 0
+
+# Compact transcript storage
+class CompactTranscript:
+    """A processed transcript held in flat columns instead of per-segment dicts.
+
+    Start times and durations live in array('d') columns and all segment text in
+    one string, which doubles as full_text, addressed by offsets. Chunks are
+    segment index ranges into it. The public segment and chunk dicts are only
+    built while a response is serialized.
+    """
+
+    def __init__(self, video_id, segments, chunk_ranges, language=None):
+        self.video_id = video_id
+        self.language = language or {"language": "en", "language_name": None, "is_generated": None, "translated_from": None}
+        self.starts = array('d', (segment['start'] for segment in segments))
+        self.durations = array('d', (segment['duration'] for segment in segments))
+        texts = [segment['text'] for segment in segments]
+        self.text = " ".join(texts)
+        # Segment i is text[offsets[i]:offsets[i + 1] - 1]; the -1 drops the joining space
+        self.offsets = array('Q', accumulate((len(text) + 1 for text in texts), initial=0))
+        self.chunk_starts = array('I', (start for start, _ in chunk_ranges))
+        self.chunk_ends = array('I', (end for _, end in chunk_ranges))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def chunk_count(self):
+        return len(self.chunk_starts)
+
+    def text_between(self, first, last):
+        """Text of segments [first, last) joined by spaces, sliced straight from the buffer"""
+        if first >= last:
+            return ""
+        return self.text[self.offsets[first]:self.offsets[last] - 1]
+
+    def segment_text(self, i):
+        return self.text_between(i, i + 1)
+
+    def metadata(self):
+        return {
+            "total_segments": len(self),
+            "total_chunks": self.chunk_count(),
+            "duration": self.starts[-1] + self.durations[-1] if len(self) else 0.0,
+            **self.language
+        }
+
+    def segment(self, i):
+        """Public dict for segment i"""
+        start = self.starts[i]
+        return {
+            "id": i,
+            "text": self.segment_text(i),
+            "start": start,
+            "duration": self.durations[i],
+            "timestamp": {
+                "seconds": int(start),
+                "formatted": format_timestamp(start)
+            }
+        }
+
+    def chunk(self, chunk_id):
+        """Public dict for a chunk, derived from its segment range"""
+        first, last = self.chunk_starts[chunk_id], self.chunk_ends[chunk_id]
+        chunk_text = self.text_between(first, last)
+        start_time = self.starts[first]
+        end_time = self.starts[last - 1] + self.durations[last - 1]
+        duration = float(end_time) - float(start_time)
+        
+        # Format timestamp once and reuse
+        start_formatted = format_timestamp(start_time)
+        end_formatted = format_timestamp(end_time)
+        
+        # Calculate words for analytics
+        words = chunk_text.split()
+        
+        return {
+            "id": chunk_id,
+            "text": chunk_text,
+            "timestamp": {
+                "start": int(start_time),
+                "end": int(end_time),
+                "duration": round(duration, 2),
+                "formatted": f"{start_formatted} - {end_formatted}"
+            },
+            "analytics": {
+                "word_count": len(words),
+                "speaking_rate": round(len(words) / duration, 2) if duration > 0 else 0
+            },
+            "embedding_text": f"At {start_formatted} to {end_formatted}: {chunk_text}"
+        }
+
+    def select(self, start, end, offset=0, limit=None):
+        """Return (first, last, low, high): the segment page [first, last) within the time range's segments [low, high)"""
+        # Caption tracks are ordered by start time, which the binary search relies on
+        low = bisect.bisect_left(self.starts, start)
+        # Segments that began earlier but are still being spoken at `start` belong to the range too
+        while low > 0 and self.starts[low - 1] + self.durations[low - 1] > start:
+            low -= 1
+        high = bisect.bisect_left(self.starts, end)
+        first = min(low + offset, high)
+        last = high if limit is None else min(high, first + limit)
+        return first, last, low, high
+
+    def chunks_for(self, first, last):
+        """Index range of the chunks holding any of segments [first, last)"""
+        if first >= last:
+            return 0, 0
+        # Chunk start and end indices both grow monotonically, overlap included
+        return bisect.bisect_right(self.chunk_ends, first), bisect.bisect_left(self.chunk_starts, last)
+
+    def view(self):
+        return TranscriptView(self, 0, len(self), 0, self.chunk_count())
+
+    def rechunk(self, chunk_options):
+        """The same segments under other chunk options; the segment columns are shared, not copied"""
+        segments = [{"duration": duration, "text": self.segment_text(i)} for i, duration in enumerate(self.durations)]
+        chunk_ranges = list(iter_chunk_ranges(segments, **chunk_options))
+        transcript = copy.copy(self)
+        transcript.chunk_starts = array('I', (start for start, _ in chunk_ranges))
+        transcript.chunk_ends = array('I', (end for _, end in chunk_ranges))
+        return transcript
+
+    def to_bytes(self):
+        """Compressed serialized form, for the shared store"""
+        columns = [self.text.encode('utf-8', 'surrogatepass')]
+        columns.extend(column.tobytes() for column in (self.starts, self.durations, self.offsets, self.chunk_starts, self.chunk_ends))
+        header = json.dumps({"video_id": self.video_id, "language": self.language, "lengths": [len(column) for column in columns]})
+        return zlib.compress(header.encode() + b"\n" + b"".join(columns))
+
+    @classmethod
+    def from_bytes(cls, payload):
+        header, _, body = zlib.decompress(payload).partition(b"\n")
+        header = json.loads(header)
+        columns = []
+        position = 0
+        for length in header["lengths"]:
+            columns.append(body[position:position + length])
+            position += length
+        
+        transcript = cls.__new__(cls)
+        transcript.video_id = header["video_id"]
+        transcript.language = header["language"]
+        transcript.text = columns[0].decode('utf-8', 'surrogatepass')
+        for name, typecode, column in zip(('starts', 'durations', 'offsets', 'chunk_starts', 'chunk_ends'), 'ddQII', columns[1:]):
+            values = array(typecode)
+            values.frombytes(column)
+            setattr(transcript, name, values)
+        return transcript
+
+    def digest(self):
+        """Content hash over every column"""
+        digest = hashlib.sha1(self.video_id.encode())
+        digest.update(json.dumps(self.language, sort_keys=True).encode())
+        digest.update(self.text.encode('utf-8', 'surrogatepass'))
+        for column in (self.starts, self.durations, self.offsets, self.chunk_starts, self.chunk_ends):
+            digest.update(column.tobytes())
+        return digest.hexdigest()
+
+    def size(self):
+        return sum(sys.getsizeof(part) for part in (self.text, self.starts, self.durations, self.offsets, self.chunk_starts, self.chunk_ends))
+
+class TranscriptView:
+    """The part of a CompactTranscript one response covers: segments [first, last) and the chunks holding them"""
+
+    def __init__(self, transcript, first, last, chunk_first, chunk_last, page=None):
+        self.transcript = transcript
+        self.video_id = transcript.video_id
+        self.first = first
+        self.last = last
+        self.chunk_first = chunk_first
+        self.chunk_last = chunk_last
+        self.page = page  # Range query details reported in metadata
+
+    def metadata(self):
+        metadata = self.transcript.metadata()
+        if self.page is not None:
+            metadata["range"] = self.page
+        return metadata
+
+    def full_text(self):
+        return self.transcript.text_between(self.first, self.last)
+
+    def iter_segments(self):
+        return map(self.transcript.segment, range(self.first, self.last))
+
+    def iter_chunks(self):
+        return map(self.transcript.chunk, range(self.chunk_first, self.chunk_last))
+
+# Response shaping
+TRANSCRIPT_FIELDS = ('metadata', 'full_text', 'segments', 'chunks')
+OUTPUT_FORMATS = ('json', 'ndjson')
+STREAM_BUFFER_SIZE = 64 * 1024  # Bytes gathered before each streamed write
+
+def parse_fields(value):
+    """Parse a comma-separated fields= parameter into the set of sections to return"""
+    if not value:
+        return set(TRANSCRIPT_FIELDS), None
+    fields = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = fields - set(TRANSCRIPT_FIELDS)
+    if unknown or not fields:
+        return None, f"Unknown fields: {', '.join(sorted(unknown)) or value}. Choose from {', '.join(TRANSCRIPT_FIELDS)}"
+    return fields, None
+
+def project_transcript(view, fields):
+    """Response document for a transcript view carrying only the requested sections"""
+    data = {"video_id": view.video_id}
+    if 'metadata' in fields:
+        data["metadata"] = view.metadata()
+    transcript = {}
+    if 'full_text' in fields:
+        transcript["full_text"] = view.full_text()
+    if 'segments' in fields:
+        transcript["segments"] = list(view.iter_segments())
+    if 'chunks' in fields:
+        transcript["chunks"] = list(view.iter_chunks())
+    if transcript:
+        data["transcript"] = transcript
+    return {"success": True, "data": data}
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+def iter_transcript_json(view, fields):
+    """Write the (projected) transcript document piece by piece instead of as one string"""
+    yield '{"success":true,"data":{"video_id":' + _dumps(view.video_id)
+    if 'metadata' in fields:
+        yield ',"metadata":' + _dumps(view.metadata())
+    
+    sections = [name for name in ('full_text', 'segments', 'chunks') if name in fields]
+    if sections:
+        yield ',"transcript":{'
+        for position, name in enumerate(sections):
+            separator = ',' if position else ''
+            if name == 'full_text':
+                yield separator + '"full_text":' + _dumps(view.full_text())
+                continue
+            yield separator + _dumps(name) + ':['
+            items = view.iter_segments() if name == 'segments' else view.iter_chunks()
+            for i, item in enumerate(items):
+                yield (',' if i else '') + _dumps(item)
+            yield ']'
+        yield '}'
+    yield '}}'
+
+def iter_transcript_ndjson(view, fields):
+    """One JSON line per section record: metadata, full_text, then each segment and chunk"""
+    video_id = view.video_id
+    if 'metadata' in fields:
+        yield _dumps({"type": "metadata", "video_id": video_id, **view.metadata()}) + "\n"
+    if 'full_text' in fields:
+        yield _dumps({"type": "full_text", "video_id": video_id, "text": view.full_text()}) + "\n"
+    if 'segments' in fields:
+        for item in view.iter_segments():
+            yield _dumps({"type": "segment", **item}) + "\n"
+    if 'chunks' in fields:
+        for item in view.iter_chunks():
+            yield _dumps({"type": "chunk", **item}) + "\n"
+
+def buffer_stream(pieces, size=STREAM_BUFFER_SIZE):
+    """Group many small streamed pieces into fewer, larger writes"""
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+# Range queries
+RANGE_PARAMS = ('start', 'end', 'offset', 'limit')
+
+def parse_range_options(params):
+    """Read start/end (seconds) and offset/limit (segments) from query parameters.
+
+    Returns (options, error); options is None when no range parameter was given.
+    """
+    if all(params.get(name) in (None, '') for name in RANGE_PARAMS):
+        return None, None
+    options = {"start": 0.0, "end": math.inf, "offset": 0, "limit": None}
+    try:
+        for name in ('start', 'end'):
+            if params.get(name) not in (None, ''):
+                options[name] = float(params.get(name))
+        for name in ('offset', 'limit'):
+            if params.get(name) not in (None, ''):
+                options[name] = int(params.get(name))
+    except (TypeError, ValueError):
+        return None, "start and end must be numbers of seconds, offset and limit whole numbers"
+    
+    if math.isnan(options['start']) or math.isnan(options['end']) or options['start'] < 0:
+        return None, "start must be at least 0"
+    if options['end'] <= options['start']:
+        return None, "end must be greater than start"
+    if options['offset'] < 0:
+        return None, "offset must be at least 0"
+    if options['limit'] is not None and options['limit'] < 1:
+        return None, "limit must be at least 1"
+    return options, None
+
+def range_key(options):
+    return tuple(options[name] for name in RANGE_PARAMS) if options else None
+
+# Transcript search
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = int(os.environ.get('SEARCH_MAX_LIMIT', 100))  # Hits returned per query at most
+PHRASE_MATCH_BOOST = 2.0  # Score multiplier when a segment holds the query words as one phrase
+BM25_K1 = 1.2  # How quickly repeats of a word in one segment stop adding to its score
+BM25_B = 0.75  # How much longer segments are discounted
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+class TranscriptSearchIndex:
+    """Inverted index from token to the ids of the segments that contain it, with per-segment term counts"""
+
+    def __init__(self, transcript):
+        postings = {}
+        counts = {}
+        lengths = []
+        for segment_id in range(len(transcript)):
+            segment_tokens = tokenize(transcript.segment_text(segment_id))
+            lengths.append(len(segment_tokens))
+            for token, count in Counter(segment_tokens).items():
+                token = sys.intern(token)
+                postings.setdefault(token, []).append(segment_id)
+                counts.setdefault(token, []).append(min(count, 255))
+        # All posting lists packed into one id array; token i owns ids[bounds[i]:bounds[i + 1]], with counts alongside
+        self._token_ids = {token: i for i, token in enumerate(postings)}
+        self._ids = array('I', (segment_id for ids in postings.values() for segment_id in ids))
+        self._counts = array('B', (count for token in postings for count in counts[token]))
+        self._bounds = array('I', accumulate((len(ids) for ids in postings.values()), initial=0))
+        # BM25's length normalisation per segment, so scoring a posting is one division
+        average_length = (sum(lengths) / len(lengths) if lengths else 0) or 1
+        self._norms = array('f', (BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) for length in lengths))
+        self.segment_count = len(transcript)
+
+    def tokens(self):
+        return self._token_ids.keys()
+
+    def postings(self, token):
+        """Ids of the segments holding token, in order (empty if none)"""
+        i = self._token_ids.get(token)
+        if i is None:
+            return array('I')
+        return self._ids[self._bounds[i]:self._bounds[i + 1]]
+
+    def size(self):
+        """Rough memory footprint, for cache accounting; token strings are interned and shared"""
+        parts = (self._token_ids, self._ids, self._counts, self._bounds, self._norms)
+        return sum(sys.getsizeof(part) for part in parts) + 28 * len(self._token_ids)
+
+    def search(self, tokens, transcript, limit):
+        """Return (total, hits): how many segments hold every token and the best `limit` as (score, segment_id).
+
+        Segments are scored with BM25: rare words weigh more, and so do words
+        repeated within a short segment. Segments holding the whole query as a
+        phrase score PHRASE_MATCH_BOOST times higher. Ties go to the earlier segment.
+        """
+        terms = []  # (weight, ids, counts) per distinct token
+        for token in set(tokens):
+            i = self._token_ids.get(token)
+            if i is None:
+                return 0, []
+            low, high = self._bounds[i], self._bounds[i + 1]
+            weight = math.log(1 + self.segment_count / (high - low)) * (BM25_K1 + 1)  # IDF times BM25's tf ceiling
+            terms.append((weight, self._ids[low:high], self._counts[low:high]))
+        if not terms:
+            return 0, []
+        terms.sort(key=lambda term: len(term[1]))
+        matches = set(terms[0][1])
+        for _, ids, _ in terms[1:]:
+            matches.intersection_update(ids)
+            if not matches:
+                return 0, []
+        
+        norms = self._norms
+        if len(terms) == 1:
+            # Ranking by tf alone; the shared weight is applied to the survivors. Negated ids break ties to the earlier segment
+            weight, ids, counts = terms[0]
+            best = heapq.nlargest(limit, ((count / (count + norms[segment_id]), -segment_id) for segment_id, count in zip(ids, counts)))
+            return len(matches), [(round(weight * tf, 4), -segment_id) for tf, segment_id in best]
+        
+        phrase = re.compile(r"\b" + r"\W+".join(map(re.escape, tokens)) + r"\b", re.IGNORECASE)
+        
+        def score(segment_id):
+            norm = norms[segment_id]
+            total = 0.0
+            for weight, ids, counts in terms:
+                count = counts[bisect.bisect_left(ids, segment_id)]
+                total += weight * count / (count + norm)
+            if phrase.search(transcript.segment_text(segment_id)):
+                total *= PHRASE_MATCH_BOOST
+            return round(total, 4)
+        
+        return len(matches), heapq.nsmallest(limit, ((score(segment_id), segment_id) for segment_id in matches), key=lambda hit: (-hit[0], hit[1]))
+
+class TranscriptSearch:
+    """Token to transcript index over the transcripts currently in the cache, kept in step by cache listeners"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._texts = {}  # text key -> {cache_key: CachedTranscript}
+        self._postings = {}  # token -> set of text keys
+        self.queries = 0
+
+    @staticmethod
+    def text_key(cache_key, entry):
+        """Variants that differ only in chunking share their segments; each language track has its own"""
+        language = entry.transcript.language
+        return (cache_key[0], language["language"], language["is_generated"], language["translated_from"])
+
+    def add(self, cache_key, entry):
+        text_key = self.text_key(cache_key, entry)
+        with self._lock:
+            entries = self._texts.setdefault(text_key, {})
+            indexed = bool(entries)
+            entries[cache_key] = entry
+            if not indexed:
+                for token in entry.search_index.tokens():
+                    self._postings.setdefault(token, set()).add(text_key)
+
+    def remove(self, cache_key, entry):
+        text_key = self.text_key(cache_key, entry)
+        with self._lock:
+            entries = self._texts.get(text_key)
+            if not entries or entries.get(cache_key) is not entry:
+                return
+            del entries[cache_key]
+            if entries:
+                return
+            del self._texts[text_key]
+            for token in entry.search_index.tokens():
+                text_keys = self._postings.get(token)
+                if text_keys is not None:
+                    text_keys.discard(text_key)
+                    if not text_keys:
+                        del self._postings[token]
+
+    def candidates(self, tokens):
+        """One cached transcript per distinct text that holds every token"""
+        with self._lock:
+            self.queries += 1
+            sets = [self._postings.get(token) for token in set(tokens)]
+            if not sets or not all(sets):
+                return []
+            text_keys = set.intersection(*sorted(sets, key=len))
+            # Any variant under a text key has the matching segments
+            return [next(iter(self._texts[text_key].values())) for text_key in text_keys]
+
+    def search(self, tokens, limit):
+        """Return (total, hits) across all cached transcripts, hits being the best `limit` as (score, entry, segment_id)"""
+        total = 0
+        hits = []
+        for entry in self.candidates(tokens):
+            if TRANSCRIPT_CACHE.peek(entry.cache_key) is not entry:
+                continue  # Expired or replaced since the candidates were read
+            matched, best = entry.search(tokens, limit)
+            total += matched
+            hits.extend((score, entry, segment_id) for score, segment_id in best)
+        return total, heapq.nsmallest(limit, hits, key=lambda hit: (-hit[0], hit[1].cache_key[0], hit[2]))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "videos": len({text_key[0] for text_key in self._texts}),
+                "transcripts": len(self._texts),
+                "cached_variants": sum(len(entries) for entries in self._texts.values()),
+                "tokens": len(self._postings),
+                "queries": self.queries
+            }
+
+TRANSCRIPT_SEARCH = TranscriptSearch()
+TRANSCRIPT_CACHE.add_listener(TRANSCRIPT_SEARCH.add, TRANSCRIPT_SEARCH.remove)
+
+def search_hit(entry, segment_id, score):
+    """Public form of a search hit: the segment, where it is, and the chunk it belongs to"""
+    transcript = entry.transcript
+    segment = transcript.segment(segment_id)
+    chunk_first, _ = transcript.chunks_for(segment_id, segment_id + 1)
+    chunk = transcript.chunk(chunk_first)
+    return {
+        "video_id": entry.cache_key[0],
+        "language": transcript.language["language"],
+        "score": score,
+        "segment": {
+            "id": segment_id,
+            "text": segment['text'],
+            "start": segment['start'],
+            "timestamp": segment['timestamp']
+        },
+        "chunk": {
+            "id": chunk['id'],
+            "timestamp": chunk['timestamp']
+        }
+    }
+
+# HTTP caching
+TRANSCRIPT_HTTP_MAX_AGE = int(os.environ.get('TRANSCRIPT_HTTP_MAX_AGE', 3600))  # Cache-Control max-age in seconds
+STORED_BODIES_PER_TRANSCRIPT = 4  # Distinct fields/format variants kept pre-compressed per transcript
+GZIP_LEVEL = 6
+GZIP_ETAG_SUFFIX = '-gzip'  # Strong validators differ per content coding
+ETAG_INDEX_MAX_ENTRIES = int(os.environ.get('ETAG_INDEX_MAX_ENTRIES', 65536))
+ETAG_INDEX_TTL = int(os.environ.get('ETAG_INDEX_TTL', 86400))  # Seconds a validator is honoured after its transcript left the cache
+
+def transcript_etag(cache_key, digest, output_key, encoding=None):
+    """Stable validator for one rendering of a transcript in one content coding"""
+    tag = f"{cache_key[0]}|{digest}|{cache_key[1:]}|{output_key}"
+    return hashlib.sha1(tag.encode()).hexdigest() + (GZIP_ETAG_SUFFIX if encoding == 'gzip' else '')
+
+def etag_matches(etag):
+    """Weak If-None-Match comparison that accepts the tag of any content coding of the same rendering"""
+    base = etag.removesuffix(GZIP_ETAG_SUFFIX)
+    return request.if_none_match.contains_weak(base) or request.if_none_match.contains_weak(base + GZIP_ETAG_SUFFIX)
+
+# Content digests by cache key, kept after the transcript itself is evicted so conditional GETs never go upstream
+TRANSCRIPT_DIGESTS = TranscriptCache(ETAG_INDEX_MAX_ENTRIES, ETAG_INDEX_MAX_ENTRIES, ETAG_INDEX_TTL)  # Sized by count
+TRANSCRIPT_CACHE.add_listener(lambda cache_key, entry: TRANSCRIPT_DIGESTS.set(cache_key, entry.digest, 1), lambda cache_key, entry: None)
+
+class HttpCacheStats:
+    """Counters for conditional GETs and stored response bodies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.body_hits = 0
+        self.body_misses = 0
+        self.gzip_served = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "not_modified": self.not_modified,
+                "stored_body_hits": self.body_hits,
+                "stored_body_misses": self.body_misses,
+                "gzip_served": self.gzip_served
+            }
+
+HTTP_CACHE_STATS = HttpCacheStats()
+
+class CachedTranscript:
+    """A processed transcript plus what is derived from it: a content digest and stored response bodies"""
+
+    def __init__(self, cache_key, transcript):
+        self.cache_key = cache_key
+        self.transcript = transcript
+        self.digest = transcript.digest()
+        self.search_index = TranscriptSearchIndex(transcript)
+        self.size = transcript.size() + self.search_index.size()
+        self._bodies = OrderedDict()  # output key -> gzip-compressed body
+        self._lock = threading.Lock()
+
+    def etag(self, output_key, encoding=None):
+        return transcript_etag(self.cache_key, self.digest, output_key, encoding)
+
+    def search(self, tokens, limit):
+        return self.search_index.search(tokens, self.transcript, limit)
+
+    def view(self):
+        return self.transcript.view()
+
+    def select_range(self, options):
+        """View of the segments in a time range page and the chunks holding them"""
+        transcript = self.transcript
+        first, last, low, high = transcript.select(options["start"], options["end"], options["offset"], options["limit"])
+        chunk_first, chunk_last = transcript.chunks_for(first, last)
+        page = {
+            "start": options["start"],
+            "end": None if options["end"] == math.inf else options["end"],
+            "offset": options["offset"],
+            "limit": options["limit"],
+            "matched_segments": high - low,
+            "returned_segments": last - first,
+            "next_offset": options["offset"] + last - first if last < high else None
+        }
+        return TranscriptView(transcript, first, last, chunk_first, chunk_last, page)
+
+    def gzipped_body(self, output_key, render):
+        """Return the gzip-compressed body for output_key, rendering and storing it on first use"""
+        with self._lock:
+            body = self._bodies.get(output_key)
+            if body is not None:
+                self._bodies.move_to_end(output_key)
+                HTTP_CACHE_STATS.incr("body_hits")
+                return body
+        
+        HTTP_CACHE_STATS.incr("body_misses")
+        rendered = render()
+        with timed_stage('compress'):
+            body = gzip.compress(rendered, compresslevel=GZIP_LEVEL)
+        with self._lock:
+            if output_key not in self._bodies:
+                self._bodies[output_key] = body
+                delta = len(body)
+                while len(self._bodies) > STORED_BODIES_PER_TRANSCRIPT:
+                    _, dropped = self._bodies.popitem(last=False)
+                    delta -= len(dropped)
+                TRANSCRIPT_CACHE.grow(self.cache_key, delta)
+        return body
+
+def processed_cache_key(video_id, chunk_options=None, language_options=None):
+    return transcript_cache_key(video_id, {**(chunk_options or DEFAULT_CHUNK_OPTIONS), **(language_options or DEFAULT_LANGUAGE_OPTIONS)})
+
+def source_cache_key(video_id, language_options=None):
+    """Key of the fetched segments, which depend only on the video and the language options"""
+    language_options = language_options or DEFAULT_LANGUAGE_OPTIONS
+    return (video_id, language_options["languages"], language_options["translate"])
+
+def get_source_transcript(video_id, language_options=None, fetch=None):
+    """Return the fetched CompactTranscript in the default chunking (or an error tuple), fetching it at most once at a time"""
+    source_key = source_cache_key(video_id, language_options)
+    source = TRANSCRIPT_SOURCES.get(source_key)
+    if source is not None:
+        return source
+    # Videos that recently failed for good are answered without asking YouTube again
+    failure = FAILURE_CACHE.get(source_key)
+    if failure is not None:
+        return failure
+    
+    def fetch_source():
+        # Another worker on this node may already have fetched the transcript
+        if SHARED_STORE:
+            with timed_stage('shared_store'):
+                shared = SHARED_STORE.load_transcript(source_key)
+            if shared is not None:
+                source, expires_at = shared
+                TRANSCRIPT_SOURCES.set(source_key, source, source.size(), ttl=expires_at - time.time())
+                return source
+        
+        result = _fetch_and_process_transcript(video_id, language_options, fetch)
+        if isinstance(result, tuple):
+            body, status = result
+            if status == 404:  # Only permanent failures are 404s
+                FAILURE_CACHE.set(source_key, result, len(json.dumps(body)))
+            return result
+        TRANSCRIPT_SOURCES.set(source_key, result, result.size())
+        if SHARED_STORE:
+            SHARED_STORE.save_transcript(source_key, result, TRANSCRIPT_CACHE_TTL)
+        return result
+    
+    # Requests for any chunking of the same video and language share one upstream fetch
+    return TRANSCRIPT_FLIGHTS.do(("source",) + source_key, fetch_source, timeout=FETCH_COALESCE_TIMEOUT)
+
+def get_processed_transcript(video_id, chunk_options=None, language_options=None, fetch=None):
+    """Return the CachedTranscript for video_id (or an error tuple), serving repeat requests from the cache.
+
+    `fetch` optionally replaces fetch_transcript_data on a miss and returns (segments, language).
+    """
+    chunk_options = chunk_options or DEFAULT_CHUNK_OPTIONS
+    language_options = language_options or DEFAULT_LANGUAGE_OPTIONS
+    cache_key = processed_cache_key(video_id, chunk_options, language_options)
+    with timed_stage('cache_lookup'):
+        cached = TRANSCRIPT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    def build_and_cache():
+        source = get_source_transcript(video_id, language_options, fetch)
+        if isinstance(source, tuple):  # Error case
+            return source
+        if chunk_options == DEFAULT_CHUNK_OPTIONS:
+            transcript = source
+        else:
+            with timed_stage('chunking'):
+                transcript = source.rechunk(chunk_options)
+        entry = CachedTranscript(cache_key, transcript)
+        TRANSCRIPT_CACHE.set(cache_key, entry, entry.size)
+        return entry
+    
+    # Concurrent callers for the same transcript wait on the first caller's result
+    try:
+        return TRANSCRIPT_FLIGHTS.do(cache_key, build_and_cache, timeout=FETCH_COALESCE_TIMEOUT)
+    except CoalescedFetchTimeout:
+        return {
+            "success": False,
+            "error": "Timed out waiting for an in-progress fetch of this video",
+            "suggestion": "Retry shortly; the transcript is likely to be cached by then.",
+            "video_id": video_id
+        }, 504
+
+def process_transcript(video_id, chunk_options=None, language_options=None, fetch=None):
+    """Return a TranscriptView of the whole processed transcript for video_id, or an (error, status) tuple"""
+    entry = get_processed_transcript(video_id, chunk_options, language_options, fetch)
+    if isinstance(entry, tuple):  # Error case
+        return entry
+    return entry.view()
+
+def _fetch_and_process_transcript(video_id, language_options, fetch=None):
+    try:
+        try:
+            with timed_stage('upstream_fetch'):
+                if fetch is None:
+                    (transcript_data, language), _ = fetch_transcript_data(video_id, language_options)
+                else:
+                    transcript_data, language = fetch()
+        
+        except ProxyBudgetExhausted:
+            return {
+                "success": False,
+                "error": "YouTube is blocking direct requests and the proxy fallback is at capacity.",
+                "suggestion": "Retry shortly.",
+                "video_id": video_id,
+                "retry_after": OVERLOAD_RETRY_AFTER
+            }, 503
+        
+        except ProxiesExhausted as e:
+            # Blocked directly and every proxy failed
+            return {
+                "success": False,
+                "error": "YouTube is blocking requests from this cloud server and all available proxies failed.",
+                "suggestion": "Try different videos or wait a few minutes. Some videos may work better than others.",
+                "technical_info": "Cloud providers like Render, Heroku, AWS are often blocked by YouTube's anti-bot measures.",
+                "solutions": [
+                    "Try testing with different video IDs",
+                    "Some videos work better than others", 
+                    "Wait 10-15 minutes and try again",
+                    "Try videos that are more popular or educational content",
+                    "Consider using a VPS with residential IP instead of cloud hosting"
+                ],
+                "video_id": video_id,
+                "proxy_attempts": f"Tried {len(e.tried_proxies)} proxies but all failed" + (" before the deadline" if e.timed_out else ""),
+                "available_proxies": PROXY_POOL.available_count()
+            }, 503
+        
+        except Exception as error_occurred:
+            message = permanent_error_message(error_occurred)
+            if message is not None:
+                return {
+                    "success": False,
+                    "error": message,
+                    "reason": type(error_occurred).__name__,
+                    "video_id": video_id
+                }, 404
+            else:
+                return {
+                    "success": False,
+                    "error": f"Error retrieving transcript: {str(error_occurred)}",
+                    "video_id": video_id
+                }, 500
+        
+        with timed_stage('chunking'):
+            chunk_ranges = list(iter_chunk_ranges(transcript_data, **DEFAULT_CHUNK_OPTIONS))
+
+        with timed_stage('compact_build'):
+            transcript = CompactTranscript(video_id, transcript_data, chunk_ranges, language)
+        return transcript
+    except Exception as e:
         return {"success": False, "error": str(e)}, 400
 
 @app.route('/transcript', methods=['GET'])
+@admission_controlled()
 def get_transcript():
     """API endpoint to get transcript for a YouTube video"""
     video_id = request.args.get('video_id')
@@ -489,11 +2822,340 @@ def get_transcript():
             "success": False,
             "error": "Missing video_id parameter"
         }), 400
+    
+    chunk_options, error = parse_chunk_options(request.args)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    fields, error = parse_fields(request.args.get('fields'))
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    output_format = request.args.get('format', 'json')
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown format: {output_format}. Choose from {', '.join(OUTPUT_FORMATS)}"
+        }), 400
+    
+    range_options, error = parse_range_options(request.args)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    language_options, error = parse_language_options(request.args)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+        
+    stream = output_format == 'ndjson' or request.args.get('stream') == '1'
+    output_key = (tuple(sorted(fields)), output_format, stream, range_key(range_options))
+    # Only whole documents are kept as stored gzip bodies; streams and range pages go out uncompressed
+    encoding = 'gzip' if not stream and not range_options and request.accept_encodings.quality('gzip') > 0 else None
+    
+    # A validator we issued earlier is answered from its digest, even after the transcript left the cache
+    cache_key = processed_cache_key(video_id, chunk_options, language_options)
+    digest = TRANSCRIPT_DIGESTS.get(cache_key)
+    etag = transcript_etag(cache_key, digest, output_key, encoding) if digest else None
+    
+    if etag and etag_matches(etag):
+        HTTP_CACHE_STATS.incr("not_modified")
+        response = Response(status=304)
+    else:
+        entry = get_processed_transcript(video_id, chunk_options, language_options)
+        if isinstance(entry, tuple):  # Error case
+            return error_response(*entry)
+        etag = entry.etag(output_key, encoding)
+        
+        # The client already has this exact rendering: answer without serializing anything
+        if etag_matches(etag):
+            HTTP_CACHE_STATS.incr("not_modified")
+            response = Response(status=304)
+        # Streamed output writes segments and chunks incrementally rather than as one document
+        elif stream:
+            view = entry.select_range(range_options) if range_options else entry.view()
+            if output_format == 'ndjson':
+                response = Response(buffer_stream(iter_transcript_ndjson(view, fields)), mimetype='application/x-ndjson')
+            else:
+                response = Response(buffer_stream(iter_transcript_json(view, fields)), mimetype='application/json')
+        # Range pages are small and too varied to be worth keeping as stored bodies
+        elif range_options:
+            with timed_stage('serialize'):
+                body = app.json.dumps(project_transcript(entry.select_range(range_options), fields), separators=(',', ':'))
+            response = Response(body, mimetype='application/json')
+        else:
+            def render():
+                with timed_stage('serialize'):
+                    return app.json.dumps(project_transcript(entry.view(), fields), separators=(',', ':')).encode()
+            
+            # Bodies are stored gzip-compressed, so gzip clients get the stored bytes as-is
+            body = entry.gzipped_body(output_key, render)
+            if encoding == 'gzip':
+                HTTP_CACHE_STATS.incr("gzip_served")
+                response = Response(body, mimetype='application/json')
+                response.headers['Content-Encoding'] = 'gzip'
+            else:
+                response = Response(gzip.decompress(body), mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={TRANSCRIPT_HTTP_MAX_AGE}"
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/transcript/languages', methods=['GET'])
+@admission_controlled()
+def get_transcript_languages():
+    """API endpoint to list the transcript languages a video offers"""
+    video_id = request.args.get('video_id')
+    if not video_id:
+        return jsonify({
+            "success": False,
+            "error": "Missing video_id parameter"
+        }), 400
+    
+    listing = TRANSCRIPT_LISTINGS.get(video_id)
+    if listing is None:
+        try:
+            (listing, _), _ = fetch_transcript_data(video_id, fetcher=list_with_client)
+        except (ProxyBudgetExhausted, ProxiesExhausted):
+            return error_response({
+                "success": False,
+                "error": "YouTube is blocking requests and no proxy could list this video's transcripts.",
+                "video_id": video_id,
+                "retry_after": OVERLOAD_RETRY_AFTER
+            }, 503)
+        except Exception as e:
+            message = permanent_error_message(e)
+            if message is None:
+                return jsonify({"success": False, "error": f"Error listing transcripts: {str(e)}", "video_id": video_id}), 500
+            return jsonify({"success": False, "error": message, "reason": type(e).__name__, "video_id": video_id}), 404
+    
+    return jsonify({
+        "success": True,
+        "video_id": video_id,
+        "transcripts": describe_listing(listing)
+    })
+
+def _multi_cost():
+    """A multi-language fetch uses one rate-limit token per language"""
+    languages = request.args.get('languages') or ''
+    return max(1, len([code for code in languages.split(',') if code.strip()]))
+
+@app.route('/transcript/multi', methods=['GET'])
+@admission_controlled(cost=_multi_cost)
+def get_transcript_multi():
+    """API endpoint to fetch one video's transcript in several languages at once"""
+    video_id = request.args.get('video_id')
+    if not video_id:
+        return jsonify({
+            "success": False,
+            "error": "Missing video_id parameter"
+        }), 400
+    if not request.args.get('languages'):
+        return jsonify({
+            "success": False,
+            "error": "Missing languages parameter"
+        }), 400
+    
+    targets, error = parse_language_options(request.args)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    # Languages without their own track are translated from the first available fallback
+    fallback, error = parse_language_options({"languages": request.args.get('fallback')})
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    chunk_options, error = parse_chunk_options(request.args)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    fields, error = parse_fields(request.args.get('fields'))
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    # One direct/proxy race finds a working path and the listing; every language then
+    # downloads its caption track over that session instead of racing (and taking a
+    # proxy-path slot) on its own. The race only runs if some language misses the cache.
+    race = {}
+    race_lock = threading.Lock()
+    
+    def winning_session(failed=None):
+        with race_lock:
+            # A session that turned out to be blocked is raced again, once, by whoever noticed first
+            if failed is not None and race.get("session") == failed and not race.get("rerun"):
+                race.clear()
+                race["rerun"] = True
+            if "session" not in race and "error" not in race:
+                try:
+                    (_, http_client), proxy = fetch_transcript_data(video_id, fetcher=list_with_client)
+                    race["session"] = http_client, proxy
+                except Exception as e:
+                    race["error"] = e
+        if "error" in race:
+            raise race["error"]
+        return race["session"]
+    
+    def fetch_language(code):
+        language_options = {"languages": tuple(dict.fromkeys((code,) + fallback["languages"])), "translate": code}
         
-    result = process_transcript(video_id)
-    if isinstance(result, tuple):  # Error case
-        return jsonify(result[0]), result[1]
-    return jsonify(result)
+        def fetch():
+            session = winning_session()
+            http_client, proxy = session
+            try:
+                return fetch_with_client(video_id, http_client, language_options, proxy)
+            except Exception as e:
+                # A cached listing wins the race on the direct path without proving it works
+                if proxy is not None or classify_fetch_error(e) != 'blocked':
+                    raise
+                DIRECT_PATH.mark_blocked()
+                http_client, proxy = winning_session(failed=session)  # Now goes straight to proxies
+                return fetch_with_client(video_id, http_client, language_options, proxy)
+        
+        return process_transcript(video_id, chunk_options, language_options, fetch)
+    
+    transcripts = {}
+    with ThreadPoolExecutor(max_workers=len(targets["languages"]), thread_name_prefix="multi") as executor:
+        futures = {submit_with_context(executor, fetch_language, code): code for code in targets["languages"]}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}, 500
+            
+            if isinstance(result, tuple):  # Error case
+                body, status = result
+                transcripts[futures[future]] = {"status": status, **body}
+            else:
+                transcripts[futures[future]] = {"status": 200, **project_transcript(result, fields)}
+    
+    return jsonify({
+        "success": any(transcript["status"] == 200 for transcript in transcripts.values()),
+        "video_id": video_id,
+        "transcripts": {code: transcripts[code] for code in targets["languages"]}
+    })
+
+@app.route('/search', methods=['GET'])
+@admission_controlled()
+def search_transcripts():
+    """API endpoint to find a phrase in one video's transcript, or in every cached transcript"""
+    query = request.args.get('q', '')
+    tokens = tokenize(query)
+    if not tokens:
+        return jsonify({
+            "success": False,
+            "error": "Missing q parameter"
+        }), 400
+    
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be a whole number"}), 400
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return jsonify({"success": False, "error": f"limit must be between 1 and {SEARCH_MAX_LIMIT}"}), 400
+    
+    video_id = request.args.get('video_id')
+    with timed_stage('search'):
+        if video_id:
+            chunk_options, error = parse_chunk_options(request.args)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+            language_options, error = parse_language_options(request.args)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+            entry = get_processed_transcript(video_id, chunk_options, language_options)
+            if isinstance(entry, tuple):  # Error case
+                return error_response(*entry)
+            total, matches = entry.search(tokens, limit)
+            hits = [search_hit(entry, segment_id, score) for score, segment_id in matches]
+        else:
+            # Only transcripts already in the cache are searched; nothing is fetched
+            total, matches = TRANSCRIPT_SEARCH.search(tokens, limit)
+            hits = [search_hit(entry, segment_id, score) for score, entry, segment_id in matches]
+    
+    return jsonify({
+        "success": True,
+        "query": query,
+        "scope": video_id or "cached",
+        "total_hits": total,
+        "hits": hits
+    })
+
+def _batch_json():
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else {}
+
+def _batch_cost():
+    """A batch uses one rate-limit token per video"""
+    video_ids = _batch_json().get('video_ids')
+    return len(video_ids) if isinstance(video_ids, list) and video_ids else 1
+
+@app.route('/transcripts', methods=['POST'])
+@admission_controlled(cost=_batch_cost)
+def get_transcripts_batch():
+    """API endpoint to fetch many transcripts in parallel, streamed as NDJSON in completion order"""
+    payload = _batch_json()
+    video_ids = payload.get('video_ids')
+    
+    if not isinstance(video_ids, list) or not video_ids:
+        return jsonify({
+            "success": False,
+            "error": "Request body must be JSON with a non-empty 'video_ids' list"
+        }), 400
+    if len(video_ids) > BATCH_MAX_SIZE:
+        return jsonify({
+            "success": False,
+            "error": f"Too many video IDs: {len(video_ids)} (maximum is {BATCH_MAX_SIZE})"
+        }), 400
+    if not all(isinstance(video_id, str) and video_id for video_id in video_ids):
+        return jsonify({
+            "success": False,
+            "error": "Every entry in 'video_ids' must be a non-empty string"
+        }), 400
+    
+    chunk_options, error = parse_chunk_options(payload)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    fields, error = parse_fields(payload.get('fields'))
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    language_options, error = parse_language_options(payload)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    
+    try:
+        concurrency = int(payload.get('concurrency', BATCH_MAX_WORKERS))
+    except (TypeError, ValueError):
+        concurrency = BATCH_MAX_WORKERS
+    max_workers = max(1, min(concurrency, BATCH_MAX_WORKERS, len(video_ids)))
+    
+    def generate():
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+        try:
+            futures = {
+                executor.submit(process_transcript, video_id, chunk_options, language_options): (index, video_id)
+                for index, video_id in enumerate(video_ids)
+            }
+            for future in as_completed(futures):
+                index, video_id = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}, 500
+                
+                if isinstance(result, tuple):  # Error case
+                    body, status = result
+                else:
+                    body, status = project_transcript(result, fields), 200
+                yield json.dumps({"index": index, "video_id": video_id, "status": status, **body}) + "\n"
+        finally:
+            # Stop queued fetches if the client goes away mid-stream
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+# Start filling the proxy pool as soon as the worker loads, not on the first blocked request
+if PROXY_REFRESH_IN_BACKGROUND:
+    PROXY_REFRESHER.ensure_started()
 
 if __name__ == '__main__':
     # For local development only